@@ -0,0 +1,506 @@
+"""
+Benchmarks de tempo e memória dos caminhos mais pesados do repositório:
+geração de sessões, simulador de teste A/B, funções do notebook da prova
+(`monte_carlo`, `criar_matriz_de_markov`), previsão de KPIs e todos os métodos
+do ChartGenerator.
+
+Cada medição (benchmark x tamanho) roda em um processo novo, para que o pico de
+memória de uma não contamine a outra. Os resultados são acrescentados a um
+histórico em JSON Lines, e o comando `comparar` aponta regressões entre duas execuções.
+
+Uso:
+    python benchmarks/benchmark.py executar --tamanhos 1e4 1e5 1e6
+    python benchmarks/benchmark.py executar --filtro ChartGenerator --tamanhos 1e7 1e8
+    python benchmarks/benchmark.py comparar --limite 0.10
+"""
+import argparse
+import ast
+import fnmatch
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RAIZ = Path(__file__).resolve().parent.parent
+HISTORICO = Path(__file__).resolve().parent / 'historico.jsonl'
+sys.path.insert(0, str(RAIZ / 'enviar_prova'))
+
+_BENCHMARKS = {}
+_modulos = {}
+
+
+def benchmark(nome, limite=None):
+    """
+    Registra um benchmark. A função decorada recebe o tamanho n, prepara os
+    dados e retorna a função sem argumentos que será cronometrada.
+    - limite: maior tamanho executado (para código com laços em Python, em que
+      1e8 linhas levaria horas); acima dele a medição é pulada
+    """
+    def registrar(preparar):
+        _BENCHMARKS[nome] = (preparar, limite)
+        return preparar
+    return registrar
+
+
+def carregar_definicoes(caminho):
+    """
+    Carrega as definições de um script ou notebook sem executar as células de
+    análise: apenas imports (inclusive em try/except), funções, classes e
+    atribuições de constantes.
+    Linhas mágicas do Jupyter (%pip, !gdown) são ignoradas.
+    """
+    caminho = RAIZ / caminho
+    if caminho in _modulos:
+        return _modulos[caminho]
+    if caminho.suffix == '.ipynb':
+        celulas = json.loads(caminho.read_text(encoding='utf-8'))['cells']
+        fonte = '\n'.join(''.join(c['source']) for c in celulas if c['cell_type'] == 'code')
+    else:
+        fonte = caminho.read_text(encoding='utf-8')
+    fonte = '\n'.join(l for l in fonte.split('\n') if not l.lstrip().startswith(('%', '!')))
+
+    def definicao(no):
+        if isinstance(no, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+            return True
+        if isinstance(no, ast.Try):
+            # import opcional com alternativa no except (ex.: instrumentação)
+            return all(isinstance(filho, (ast.Import, ast.ImportFrom)) for filho in no.body)
+        if isinstance(no, ast.Assign):
+            # literais e contas entre literais (ex.: 1 / 3), sem nomes nem chamadas
+            return all(isinstance(filho, (ast.Constant, ast.List, ast.Tuple, ast.Dict, ast.Set,
+                                          ast.UnaryOp, ast.BinOp, ast.operator, ast.unaryop, ast.Load))
+                       for filho in ast.walk(no.value))
+        return False
+
+    arvore = ast.parse(fonte)
+    arvore.body = [no for no in arvore.body if definicao(no)]
+    namespace = {'__name__': caminho.stem}
+    exec(compile(arvore, str(caminho), 'exec'), namespace)
+    _modulos[caminho] = namespace
+    return namespace
+
+
+# --- gerador de dados sintéticos ---
+
+@benchmark('gerador.gerar_sessoes', limite=1e6)
+def _gerar_sessoes(n):
+    ns = carregar_definicoes('gerador_dados_sinteticos/gerador_dados_sinteticos.py')
+    days = ns['pd'].date_range('2024-01-01', '2024-12-31', freq='D')
+    return lambda: ns['gerar_sessoes'](days, n / len(days))
+
+
+# --- simulador de teste A/B ---
+
+@benchmark('simulador.gerar_leitores', limite=1e6)
+def _gerar_leitores(n):
+    ns = carregar_definicoes('simulador_teste_ab/simulador_teste_ab.py')
+    return lambda: ns['gerar_leitores'](n)
+
+
+@benchmark('simulador.coletar_dados_teste_ab', limite=1e6)
+def _coletar_dados_teste_ab(n):
+    ns = carregar_definicoes('simulador_teste_ab/simulador_teste_ab.py')
+    return lambda: ns['coletar_dados_teste_ab'](n, 30)
+
+
+@benchmark('simulador.executar_avaliacao_ab', limite=1e6)
+def _executar_avaliacao_ab(n):
+    ns = carregar_definicoes('simulador_teste_ab/simulador_teste_ab.py')
+    return lambda: ns['executar_avaliacao_ab'](n, 30)
+
+
+@benchmark('simulador.simular_ab_vetorizado', limite=1e7)
+def _simular_ab_vetorizado(n):
+    ns = carregar_definicoes('simulador_teste_ab/simulador_teste_ab.py')
+    pontos = ns['desenho_saltelli'](8)  # 8 * (16 + 2) = 144 pontos do desenho
+    return lambda: ns['simular_ab_vetorizado'](pontos, n_leitores=max(1, int(n) // len(pontos)))
+
+
+@benchmark('avaliacao.teste_ab_ajustado')
+def _teste_ab_ajustado(n):
+    import numpy as np
+    import pandas as pd
+    from avaliacao import teste_ab_ajustado
+    n = int(n)
+    rng = np.random.default_rng(0)
+    dados = pd.DataFrame({
+        'versao': rng.choice(['A', 'B'], n),
+        'interesse': rng.beta(2, 5, n),
+        'idade': rng.integers(18, 80, n),
+        'categoria': pd.Categorical.from_codes(rng.integers(0, 5, n), list('abcde')),
+    })
+    dados['faixa'] = pd.cut(dados['idade'], bins=[17, 24, 34, 44, 54, 80])
+    dados['clicou'] = (rng.random(n) < dados['interesse']).astype(float)
+    dados['tempo'] = np.where(dados['clicou'] == 1, rng.gamma(2, 2, n) * dados['interesse'], np.nan)
+    return lambda: teste_ab_ajustado(dados, 'versao', 'A', 'B', ['clicou', 'tempo'], ['interesse', 'idade'],
+                                     ['categoria'], ['faixa', 'categoria'])
+
+
+# --- notebook da prova ---
+
+@benchmark('prova.monte_carlo', limite=1e6)
+def _monte_carlo(n):
+    import numpy as np
+    ns = carregar_definicoes('enviar_prova/prova.ipynb')
+    distribuicoes = {'sessoes': lambda: np.random.poisson(300),
+                     'taxa': lambda: np.random.normal(0.03, 0.005)}
+    return lambda: ns['monte_carlo'](lambda sessoes, taxa: sessoes * taxa, distribuicoes,
+                                     n_sim=n, summary=False, plot=False)
+
+
+@benchmark('prova.criar_matriz_de_markov')
+def _criar_matriz_de_markov(n):
+    import numpy as np
+    import pandas as pd
+    ns = carregar_definicoes('enviar_prova/prova.ipynb')
+    estados = np.array([f'estado_{i}' for i in range(20)])
+    df = pd.DataFrame({'estado': estados[np.random.randint(0, 20, n)]})
+    return lambda: ns['criar_matriz_de_markov'](df, 'estado')
+
+
+@benchmark('previsao.prever_kpi')
+def _prever_kpi(n):
+    # n é o número de caminhos simulados
+    import numpy as np
+    from previsao import prever_kpi
+    historico = np.cumsum(np.random.normal(size=1000)) + 100
+    return lambda: prever_kpi(historico, 'ar1', horizonte=12, n_caminhos=n)
+
+
+# --- ChartGenerator ---
+
+_GRAFICOS = {
+    'line_chart': (('x', 'y'), {}),
+    'bar_chart': (('c',), {'agg': 'size', 'top_n': 20}),
+    'scatter_chart': (('x', 'y'), {}),
+    'histogram': (('y',), {'bins': 50}),
+    'pie_chart': (('c',), {'agg': 'size', 'top_n': 8}),
+    'box_plot': ((['y', 'z'],), {}),
+    'heatmap': ((), {'mode': 'corr', 'columns': ['x', 'y', 'z']}),
+    'area_chart': (('x', ['y', 'z']), {}),
+    'scatter_matrix': ((), {'columns': ['x', 'y', 'z']}),
+}
+
+
+def _dados_graficos(n):
+    import numpy as np
+    import pandas as pd
+    categorias = pd.Categorical.from_codes(np.random.zipf(1.5, n) % 200, [f'cat_{i}' for i in range(200)])
+    return pd.DataFrame({
+        'x': np.arange(n, dtype=float),
+        'y': np.cumsum(np.random.normal(size=n)),
+        'z': np.random.exponential(size=n),
+        'c': categorias,
+    })
+
+
+def _benchmark_grafico(metodo, args, kwargs):
+    def preparar(n):
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from ChartGenerator import ChartGenerator
+
+        gerador = ChartGenerator(_dados_graficos(n))
+
+        def executar():
+            getattr(gerador, metodo)(*args, **kwargs)
+            plt.close('all')
+        return executar
+    benchmark(f'ChartGenerator.{metodo}')(preparar)
+
+
+for _metodo, (_args, _kwargs) in _GRAFICOS.items():
+    _benchmark_grafico(_metodo, _args, _kwargs)
+
+
+@benchmark('ChartGenerator.fan_chart')
+def _fan_chart(n):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from ChartGenerator import ChartGenerator
+    dados = _dados_graficos(n)
+    dados['baixo'], dados['alto'] = dados['y'] - dados['z'], dados['y'] + dados['z']
+    gerador = ChartGenerator(dados)
+
+    def executar():
+        gerador.fan_chart('x', 'y', [('baixo', 'alto')])
+        plt.close('all')
+    return executar
+
+
+@benchmark('ChartGenerator.histogram_stats')
+def _histogram_stats(n):
+    from ChartGenerator import ChartGenerator
+    dados = _dados_graficos(n)['y']
+    return lambda: ChartGenerator.histogram_stats(dados, bins=50)
+
+
+@benchmark('ChartGenerator.box_stats')
+def _box_stats(n):
+    from ChartGenerator import ChartGenerator
+    dados = _dados_graficos(n)['y']
+    return lambda: ChartGenerator.box_stats(dados)
+
+
+@benchmark('ChartGenerator.correlation_matrix')
+def _correlation_matrix(n):
+    from ChartGenerator import ChartGenerator
+    dados = _dados_graficos(n)
+    return lambda: ChartGenerator.correlation_matrix(dados, ['x', 'y', 'z'])
+
+
+@benchmark('ChartGenerator.render_batch')
+def _render_batch(n):
+    from ChartGenerator import ChartGenerator
+    gerador = ChartGenerator(_dados_graficos(n))
+    saida = tempfile.mkdtemp(prefix='benchmark_render_')
+    specs = [{'method': metodo, 'args': args, 'kwargs': kwargs, 'name': metodo}
+             for metodo, (args, kwargs) in _GRAFICOS.items() if metodo != 'scatter_matrix']
+    return lambda: gerador.render_batch(specs, saida)
+
+
+@benchmark('ChartGenerator.render_cached')
+def _render_cached(n):
+    # mede o acerto no cache: a primeira renderização acontece na preparação
+    from ChartGenerator import ChartGenerator
+    gerador = ChartGenerator(_dados_graficos(n), cache_dir=tempfile.mkdtemp(prefix='benchmark_cache_'))
+    gerador.render_cached('line_chart', 'x', 'y')
+    return lambda: gerador.render_cached('line_chart', 'x', 'y')
+
+
+# --- medição ---
+
+def _memoria_kb(campo):
+    """VmRSS/VmHWM do processo em kB (Linux); None em outros sistemas."""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith(campo + ':'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _zerar_pico():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _medir(nome, n, repeticoes):
+    """Executa um benchmark em um tamanho; roda dentro de um processo novo."""
+    import numpy as np
+    preparar, _ = _BENCHMARKS[nome]
+    random.seed(0)
+    np.random.seed(0)
+    executar = preparar(int(n))
+
+    gc.collect()
+    exato = _zerar_pico()
+    antes = _memoria_kb('VmRSS')
+    tempos, tempos_cpu = [], []
+    for _ in range(repeticoes):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        executar()
+        tempos.append(time.perf_counter() - inicio)
+        tempos_cpu.append(time.process_time() - inicio_cpu)
+    pico = _memoria_kb('VmHWM') if exato else None
+    if (pico is None or antes is None) and resource is not None:
+        # sem /proc: pico do processo inteiro (inclui a preparação dos dados)
+        antes, pico = 0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            pico //= 1024
+    elif pico is None or antes is None:
+        # Windows: pico das alocações rastreadas em uma execução extra, fora da medição de tempo
+        tracemalloc.start()
+        executar()
+        antes, pico = 0, tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    # o mínimo descarta o custo da primeira chamada (imports tardios, caches do matplotlib)
+    return {
+        'tempo_s': min(tempos),
+        'tempo_mediana_s': statistics.median(tempos),
+        'cpu_s': min(tempos_cpu),
+        'pico_mb': max(pico - antes, 0) / 1024,
+        'pico_exato': exato,
+    }
+
+
+def _metadados():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy as np
+    import pandas as pd
+    import matplotlib
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+        'maquina': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def executar(tamanhos, filtro=None, repeticoes=3, tempo_maximo=120.0, historico=HISTORICO):
+    """
+    Roda os benchmarks selecionados em cada tamanho e grava uma entrada no histórico.
+    - filtro: padrões (fnmatch) sobre o nome, ex.: 'simulador.*' ou '*markov*'
+    - tempo_maximo: quando uma repetição passa desse tempo (s), os tamanhos
+      seguintes do mesmo benchmark são pulados
+    Retorna a entrada gravada.
+    """
+    nomes = [nome for nome in _BENCHMARKS
+             if not filtro or any(fnmatch.fnmatch(nome, f) or f in nome for f in filtro)]
+    resultados = []
+    contexto = get_context('spawn')
+    for nome in nomes:
+        _, limite = _BENCHMARKS[nome]
+        lento = False
+        for n in sorted(tamanhos):
+            resultado = {'benchmark': nome, 'tamanho': int(n)}
+            if limite is not None and n > limite:
+                resultado['status'] = f'pulado (limite {limite:.0e})'
+            elif lento:
+                resultado['status'] = f'pulado (tempo_maximo {tempo_maximo:g}s)'
+            else:
+                try:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                        resultado.update(executor.submit(_medir, nome, n, repeticoes).result())
+                    resultado['status'] = 'ok'
+                    lento = resultado['tempo_s'] > tempo_maximo
+                except Exception as erro:  # inclui falta de memória no processo filho
+                    resultado['status'] = f'erro: {type(erro).__name__}: {erro}'
+            resultados.append(resultado)
+            _imprimir(resultado)
+
+    entrada = {'id': datetime.now().strftime('%Y%m%dT%H%M%S'), 'repeticoes': repeticoes,
+               **_metadados(), 'resultados': resultados}
+    historico = Path(historico)
+    historico.parent.mkdir(parents=True, exist_ok=True)
+    with open(historico, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+    print(f"\nExecução {entrada['id']} gravada em {historico}")
+    return entrada
+
+
+def _imprimir(resultado):
+    if resultado['status'] == 'ok':
+        print(f"{resultado['benchmark']:<40} {resultado['tamanho']:>12,} "
+              f"{resultado['tempo_s']:>10.4f}s {resultado['pico_mb']:>10.1f} MB")
+    else:
+        print(f"{resultado['benchmark']:<40} {resultado['tamanho']:>12,} {resultado['status']}")
+
+
+def _ler_historico(historico):
+    with open(historico, encoding='utf-8') as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def _escolher(execucoes, chave):
+    """Seleciona uma execução pelo id ou pela posição (ex.: -1 é a última)."""
+    for execucao in execucoes:
+        if execucao['id'] == chave:
+            return execucao
+    try:
+        return execucoes[int(chave)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"execução '{chave}' não encontrada no histórico")
+
+
+def comparar(base='-2', atual='-1', limite=0.10, historico=HISTORICO,
+             minimo_s=0.005, minimo_mb=1.0):
+    """
+    Compara duas execuções do histórico, benchmark a benchmark e tamanho a tamanho.
+    Uma regressão é um aumento relativo acima de `limite` no tempo (mínimo entre
+    as repetições) ou no pico de memória; diferenças absolutas menores que
+    minimo_s / minimo_mb são tratadas como ruído.
+    Retorna a lista de regressões.
+    """
+    execucoes = _ler_historico(historico)
+    antes, depois = _escolher(execucoes, base), _escolher(execucoes, atual)
+    referencia = {(r['benchmark'], r['tamanho']): r for r in antes['resultados'] if r['status'] == 'ok'}
+
+    print(f"base {antes['id']} ({antes.get('commit')})  ->  atual {depois['id']} ({depois.get('commit')})\n")
+    regressoes = []
+    for r in depois['resultados']:
+        b = referencia.get((r['benchmark'], r['tamanho']))
+        if r['status'] != 'ok' or b is None:
+            continue
+        marcas = []
+        for campo, minimo in (('tempo_s', minimo_s), ('pico_mb', minimo_mb)):
+            razao = r[campo] / b[campo] if b[campo] > 0 else float('inf')
+            if razao > 1 + limite and r[campo] - b[campo] > minimo:
+                marcas.append(f'{campo} +{(razao - 1) * 100:.0f}%')
+        variacao = (r['tempo_s'] / b['tempo_s'] - 1) * 100 if b['tempo_s'] > 0 else float('nan')
+        print(f"{r['benchmark']:<40} {r['tamanho']:>12,} {b['tempo_s']:>10.4f}s -> {r['tempo_s']:>10.4f}s "
+              f"({variacao:+.1f}%)  {b['pico_mb']:>8.1f} -> {r['pico_mb']:>8.1f} MB"
+              + ('  REGRESSÃO: ' + ', '.join(marcas) if marcas else ''))
+        if marcas:
+            regressoes.append({'benchmark': r['benchmark'], 'tamanho': r['tamanho'], 'regressao': marcas})
+
+    print(f"\n{len(regressoes)} regressão(ões) acima de {limite:.0%}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_exec = sub.add_parser('executar', help='roda os benchmarks e grava no histórico')
+    p_exec.add_argument('--tamanhos', nargs='+', type=float, default=[1e4, 1e5, 1e6],
+                        help='linhas/leitores por medição (padrão: 1e4 1e5 1e6; até 1e8)')
+    p_exec.add_argument('--filtro', nargs='+', help="benchmarks a rodar, ex.: 'simulador.*' ChartGenerator")
+    p_exec.add_argument('--repeticoes', type=int, default=3)
+    p_exec.add_argument('--tempo-maximo', type=float, default=120.0,
+                        help='acima desse tempo por repetição (s), pula os tamanhos maiores')
+    p_exec.add_argument('--historico', default=HISTORICO)
+
+    p_comp = sub.add_parser('comparar', help='compara duas execuções do histórico')
+    p_comp.add_argument('--base', default='-2', help='id ou posição da execução de referência (padrão: penúltima)')
+    p_comp.add_argument('--atual', default='-1', help='id ou posição da execução avaliada (padrão: última)')
+    p_comp.add_argument('--limite', type=float, default=0.10, help='aumento relativo tolerado (padrão: 0.10)')
+    p_comp.add_argument('--historico', default=HISTORICO)
+
+    p_list = sub.add_parser('listar', help='lista os benchmarks disponíveis')
+
+    args = parser.parse_args(argv)
+    if args.comando == 'executar':
+        executar(args.tamanhos, args.filtro, args.repeticoes, args.tempo_maximo, args.historico)
+    elif args.comando == 'comparar':
+        # código de saída 1 quando há regressão, para uso em CI
+        return 1 if comparar(args.base, args.atual, args.limite, args.historico) else 0
+    else:
+        for nome, (_, limite) in _BENCHMARKS.items():
+            print(nome + (f'  (até {limite:.0e})' if limite else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,590 @@
+import hashlib
+import inspect
+import itertools
+import os
+import shutil
+
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from pandas.plotting import scatter_matrix
 
+try:
+    from .instrumentacao import medir_metodos
+except ImportError:  # imported as a top-level module (enviar_prova on sys.path)
+    from instrumentacao import medir_metodos
+
+
+def _as_float(values):
+    """
+    Convert a column to float64 for binning/downsampling math (datetimes become ns since epoch).
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view('int64').astype(float)
+    if np.issubdtype(values.dtype, np.timedelta64):
+        return values.astype('timedelta64[ns]').view('int64').astype(float)
+    return values.astype(float)
+
+
+def _time_dtype(values):
+    """
+    datetime64[ns] / timedelta64[ns] for time columns (so float results can be
+    converted back by _from_float), None otherwise.
+    """
+    dtype = getattr(values, 'dtype', None)
+    if not isinstance(dtype, np.dtype):
+        dtype = np.asarray(values).dtype
+    if np.issubdtype(dtype, np.datetime64):
+        return np.dtype('datetime64[ns]')
+    if np.issubdtype(dtype, np.timedelta64):
+        return np.dtype('timedelta64[ns]')
+    return None
+
+
+def _from_float(values, dtype):
+    """
+    Inverse of _as_float for the dtype returned by _time_dtype.
+    """
+    if dtype is None:
+        return values
+    return np.round(values).astype('int64').view(dtype)
+
+
+def _minmax_indices(y, n_out):
+    """
+    Indices of the minimum and maximum of each bucket (n_out / 2 equal-size
+    buckets), plus the first and last points, in original order.
+    """
+    n = len(y)
+    n_buckets = max(1, (n_out - 2) // 2)
+    size = -(-n // n_buckets)
+    pad = n_buckets * size - n
+    y = np.nan_to_num(y, nan=np.nanmean(y) if np.isfinite(y).any() else 0.0)
+    hi = np.concatenate([y, np.full(pad, -np.inf)]).reshape(n_buckets, size)
+    lo = np.concatenate([y, np.full(pad, np.inf)]).reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    idx = np.concatenate([[0, n - 1], offsets + hi.argmax(axis=1), offsets + lo.argmin(axis=1)])
+    return np.unique(idx[idx < n])
+
+
+def _lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keeps, in each bucket, the point forming the
+    largest triangle with the previously kept point and the next bucket's mean,
+    which preserves the visual shape (including isolated peaks).
+    """
+    n = len(y)
+    y = np.nan_to_num(y, nan=np.nanmean(y) if np.isfinite(y).any() else 0.0)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        nxt_x = x[end:nxt_end].mean() if nxt_end > end else x[-1]
+        nxt_y = y[end:nxt_end].mean() if nxt_end > end else y[-1]
+        area = np.abs((x[a] - nxt_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (nxt_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return np.unique(idx)
+
+
+def _bin_2d(x, y, bins, range_=None):
+    """
+    2D histogram computed with one np.bincount over flat cell indices, which is
+    much faster than np.histogram2d on large inputs.
+
+    Returns:
+    - counts: (bins, bins) array, rows along y and columns along x.
+    - extent: (xmin, xmax, ymin, ymax) for imshow.
+    - cells: flat cell index of every finite point.
+    - finite: boolean mask of the points that were binned.
+    """
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if range_ is None:
+        range_ = ((x.min(), x.max()), (y.min(), y.max())) if len(x) else ((0, 1), (0, 1))
+    (xmin, xmax), (ymin, ymax) = range_
+    xmax, ymax = (xmax if xmax > xmin else xmin + 1), (ymax if ymax > ymin else ymin + 1)
+    ix = np.clip(((x - xmin) * (bins / (xmax - xmin))).astype(np.int64), 0, bins - 1)
+    iy = np.clip(((y - ymin) * (bins / (ymax - ymin))).astype(np.int64), 0, bins - 1)
+    cells = iy * bins + ix
+    counts = np.bincount(cells, minlength=bins * bins).reshape(bins, bins)
+    return counts, (xmin, xmax, ymin, ymax), cells, finite
+
+
+def _stratified_sample(cells, size, rng):
+    """
+    Positions of up to `size` points spread over the occupied cells: one point
+    per cell first (so sparse regions and outliers show up), then random fill.
+    """
+    n = len(cells)
+    if n <= size:
+        return np.arange(n)
+    pool = rng.choice(n, size=min(n, 10 * size), replace=False)
+    _, first = np.unique(cells[pool], return_index=True)
+    picked = pool[first]
+    if len(picked) > size:
+        return rng.choice(picked, size=size, replace=False)
+    rest = np.setdiff1d(pool, picked, assume_unique=True)
+    return np.concatenate([picked, rest[:size - len(picked)]])
+
+
+def _block_mean(values, max_shape):
+    """
+    Average a 2D array over blocks so that it fits in max_shape (NaNs ignored).
+    Returns the reduced array; a block of all-NaN cells stays NaN.
+    """
+    rows, cols = values.shape
+    fr, fc = -(-rows // max_shape[0]), -(-cols // max_shape[1])
+    if fr == 1 and fc == 1:
+        return values
+    padded = np.full((-(-rows // fr) * fr, -(-cols // fc) * fc), np.nan)
+    padded[:rows, :cols] = values
+    blocks = padded.reshape(padded.shape[0] // fr, fr, padded.shape[1] // fc, fc)
+    valid = np.isfinite(blocks)
+    total = np.where(valid, blocks, 0).sum(axis=(1, 3))
+    count = valid.sum(axis=(1, 3))
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def _decimated_ticks(labels, max_ticks):
+    """
+    At most max_ticks evenly spaced tick positions and their labels.
+    """
+    step = max(1, -(-len(labels) // max_ticks))
+    positions = np.arange(0, len(labels), step)
+    return positions, [str(labels[i]) for i in positions]
+
+
+def _join_labels(columns, sep=' - '):
+    """
+    Concatenate label columns (Series or Index objects) element-wise as strings.
+    """
+    columns = [pd.Series(c).astype(str).to_numpy(dtype=object) for c in columns]
+    labels = columns[0]
+    for column in columns[1:]:
+        labels = labels + sep + column
+    return pd.Index(labels)
+
+
+def _pair_counts(task):
+    """
+    2D histograms for a batch of column pairs; module level so a process pool can run it.
+    """
+    codes, bins, pairs = task
+    counts = []
+    for i, j in pairs:
+        valid = (codes[i] >= 0) & (codes[j] >= 0)
+        cells = codes[i][valid].astype(np.int64) * bins + codes[j][valid]
+        counts.append(np.bincount(cells, minlength=bins * bins).reshape(bins, bins))
+    return counts
+
+
+@medir_metodos(linhas=lambda result, self, *args, **kwargs: len(self.df))
 class ChartGenerator:
     """
     A class for generating various charts from a pandas DataFrame.
     """
 
-    def __init__(self, df):
+    # line_chart/area_chart downsample series longer than DOWNSAMPLE_THRESHOLD
+    # to DOWNSAMPLE_POINTS points unless told otherwise
+    DOWNSAMPLE_THRESHOLD = 10_000
+    DOWNSAMPLE_POINTS = 4_000
+    # scatter_chart switches to a binned density image above this many rows
+    DENSITY_THRESHOLD = 200_000
+    # scatter_matrix switches to binned panels above this many rows
+    SCATTER_MATRIX_THRESHOLD = 50_000
+    # parameters that name the columns a method reads; the render cache hashes
+    # only those columns, and the whole frame for methods not listed here
+    # (heatmap, scatter_matrix, ...) or calls that name no column
+    COLUMN_PARAMETERS = {
+        'line_chart': ('x', 'y'),
+        'bar_chart': ('category_col', 'value_col'),
+        'scatter_chart': ('x', 'y'),
+        'histogram': ('column',),
+        'pie_chart': ('label_col', 'size_col'),
+        'box_plot': ('columns',),
+        'area_chart': ('x', 'ys'),
+        'fan_chart': ('x', 'center', 'bands'),
+    }
+
+    def __init__(self, df, cache_dir=None, cache_max_bytes=512 * 2**20):
         """
         Initialize with a pandas DataFrame.
 
         Parameters:
         - df: pandas DataFrame containing the data.
+        - cache_dir: (optional) directory of the render cache used by render_cached
+          and render_batch; None disables caching.
+        - cache_max_bytes: (optional) size limit of the cache; least recently used
+          files are evicted beyond it.
         """
         self.df = df
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        # per-column content hashes, reused only while a render_batch call runs
+        self._hash_memo = None
+
+    def _used_columns(self, method, arguments):
+        """
+        Columns read by a method call, from its COLUMN_PARAMETERS; all columns
+        when the method is not listed or the call names no column.
+        """
+        parameters = self.COLUMN_PARAMETERS.get(method)
+        if parameters is None:
+            return list(self.df.columns)
+        names = set()
+        pending = [arguments[name] for name in parameters if name in arguments]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, (list, tuple)):
+                pending.extend(item)
+            elif isinstance(item, str) and item in self.df.columns:
+                names.add(item)
+        return [col for col in self.df.columns if col in names] or list(self.df.columns)
+
+    @staticmethod
+    def _hash_argument(h, value):
+        """
+        Feed an argument into a hash by content: arrays and pandas objects by their
+        values (their repr is truncated), containers item by item.
+        """
+        if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+            dtypes = value.dtypes.tolist() if isinstance(value, pd.DataFrame) else value.dtype
+            h.update(repr((type(value).__name__, value.shape, str(dtypes))).encode())
+            h.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray):
+            h.update(repr((value.dtype.str, value.shape)).encode())
+            h.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+        elif isinstance(value, dict):
+            h.update(b'{')
+            for key in sorted(value, key=repr):
+                h.update(repr(key).encode())
+                ChartGenerator._hash_argument(h, value[key])
+            h.update(b'}')
+        elif isinstance(value, (list, tuple)):
+            h.update(f'{type(value).__name__}[{len(value)}'.encode())
+            for item in value:
+                ChartGenerator._hash_argument(h, item)
+            h.update(b']')
+        else:
+            h.update(repr(value).encode())
+        h.update(b'|')
 
-    def line_chart(self, x, y, title=None, xlabel=None, ylabel=None, legend=None):
+    def _fingerprint(self, method, args, kwargs, dpi):
+        """
+        Cache key of a chart: hash of the used columns' contents (vectorized
+        pd.util.hash_pandas_object) plus method name, arguments and versions.
+        """
+        # positional, keyword and defaulted spellings of the same call share one key
+        bound = inspect.signature(getattr(self, method)).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        columns = self._used_columns(method, arguments)
+        memo = self._hash_memo if self._hash_memo is not None else {}
+        h = hashlib.blake2b(digest_size=16)
+        for part in [None] + columns:
+            if part not in memo:
+                values = self.df.index if part is None else self.df[part]
+                memo[part] = hashlib.blake2b(
+                    pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes(), digest_size=16
+                ).digest()
+            h.update(memo[part])
+        h.update(repr((list(columns), [str(self.df[col].dtype) for col in columns], method,
+                       dpi, matplotlib.__version__)).encode())
+        self._hash_argument(h, arguments)
+        return h.hexdigest()
+
+    def _evict_cache(self):
+        """
+        Delete least recently used files until the cache fits in cache_max_bytes.
+        """
+        entries = [e for e in os.scandir(self.cache_dir) if e.is_file()]
+        total = sum(e.stat().st_size for e in entries)
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            if total <= self.cache_max_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def _render_to_cache(self, method, args, kwargs, formats, dpi):
+        """
+        Paths of the cached renders of a chart, rendering it (once) only for the
+        formats that are missing.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self._fingerprint(method, args, kwargs, dpi)
+        paths = [os.path.join(self.cache_dir, f"{key}.{fmt}") for fmt in formats]
+        missing = [path for path in paths if not os.path.exists(path)]
+        for path in paths:
+            if path not in missing:
+                os.utime(path)  # mark as recently used
+        if missing:
+            fig, _ = getattr(self, method)(*args, **kwargs)
+            try:
+                for path in missing:
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    fig.savefig(tmp, dpi=dpi, format=path.rsplit('.', 1)[1])
+                    os.replace(tmp, path)
+            finally:
+                plt.close(fig)
+            self._evict_cache()
+        return paths
+
+    def render_cached(self, method, *args, fmt='png', dpi=100, **kwargs):
+        """
+        Render a chart to an image file through the render cache (cache_dir must be set).
+
+        The cache key covers the contents of the columns the call uses, the
+        method name and its arguments, so an unchanged chart is never rendered twice.
+
+        Parameters:
+        - method: name of a ChartGenerator method (e.g. 'histogram').
+        - args, kwargs: arguments for the method.
+        - fmt: (optional) image format.
+        - dpi: (optional) resolution of raster outputs.
+
+        Returns:
+        - path of the cached image.
+        """
+        if not self.cache_dir:
+            raise ValueError("render_cached requires ChartGenerator(df, cache_dir=...)")
+        return self._render_to_cache(method, args, kwargs, (fmt,), dpi)[0]
+
+    @staticmethod
+    def _chunks(data):
+        """
+        Yield finite float arrays from a single column or an iterable of chunks.
+        """
+        if isinstance(data, (pd.Series, pd.Index, np.ndarray, list, tuple)):
+            data = [data]
+        for chunk in data:
+            values = _as_float(chunk)
+            yield values[np.isfinite(values)]
+
+    @staticmethod
+    def histogram_stats(data, bins=10, range=None):
+        """
+        Compute histogram aggregates in one pass, to be drawn later with histogram(stats=...).
+
+        Parameters:
+        - data: a column (Series/array) or an iterable of chunks, e.g.
+          (chunk['col'] for chunk in pd.read_csv(path, chunksize=1_000_000)).
+          Datetime and timedelta columns are binned on their nanosecond values.
+        - bins: (optional) number of bins, an array of bin edges or a numpy bin
+          rule such as 'auto' (resolved on the data, or on the first chunk).
+        - range: (optional) (min, max) of the bins; required for an iterable of
+          chunks unless bins is an array.
+
+        Returns:
+        - dict with 'counts' and 'edges' (datetimes/timedeltas for time columns).
+        """
+        single = isinstance(data, (pd.Series, pd.Index, np.ndarray, list, tuple))
+        chunks = iter([data] if single else data)
+        first = next(chunks, np.array([], dtype=float))
+        unit = _time_dtype(first)
+        sample = next(ChartGenerator._chunks([first]))
+        if range is not None:
+            range = tuple(_as_float(np.asarray(range, dtype=unit)))
+        if np.ndim(bins) == 0:
+            if range is None:
+                if not single:
+                    raise ValueError("range is required when aggregating chunks")
+                range = (sample.min(), sample.max()) if len(sample) else (0, 1)
+            lo, hi = range
+            if isinstance(bins, str):
+                edges = np.histogram_bin_edges(sample, bins=bins, range=(lo, hi if hi > lo else lo + 1))
+            else:
+                edges = np.linspace(lo, hi if hi > lo else lo + 1, int(bins) + 1)
+        else:
+            edges = _as_float(np.asarray(bins, dtype=unit))
+        counts = np.histogram(sample, bins=edges)[0]
+        for values in ChartGenerator._chunks(chunks):
+            counts += np.histogram(values, bins=edges)[0]
+        return {'counts': counts, 'edges': _from_float(edges, unit)}
+
+    @staticmethod
+    def box_stats(data, label=None, whis=1.5, range=None, resolution=4096, max_fliers=100):
+        """
+        Compute box plot aggregates (quantiles, whiskers, fliers) for box_plot(stats=...).
+
+        Parameters:
+        - data: a column (Series/array) or an iterable of chunks. Quantiles are exact
+          for a single column and approximated from a `resolution`-bin histogram
+          over `range` for chunks.
+        - label: (optional) tick label of the box.
+        - whis: (optional) whisker length in IQRs.
+        - range: (optional) (min, max) for chunked input; required in that case.
+        - resolution: (optional) histogram bins used to approximate chunked quantiles.
+        - max_fliers: (optional) maximum number of outliers kept for drawing (for chunks,
+          taken from the max_fliers most extreme values on each side).
+
+        Returns:
+        - dict in the format expected by Axes.bxp.
+        """
+        empty = {'label': label, 'med': np.nan, 'q1': np.nan, 'q3': np.nan, 'mean': np.nan,
+                 'whislo': np.nan, 'whishi': np.nan, 'fliers': np.array([])}
+        if isinstance(data, (pd.Series, pd.Index, np.ndarray, list, tuple)):
+            values = next(ChartGenerator._chunks(data))
+            if not len(values):
+                return empty
+            q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+            lo, hi = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+            inside = values[(values >= lo) & (values <= hi)]
+            fliers = np.sort(values[(values < lo) | (values > hi)])
+            if len(fliers) > max_fliers:
+                fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype(int)]
+            return {'label': label, 'med': med, 'q1': q1, 'q3': q3, 'mean': values.mean(),
+                    'whislo': inside.min() if len(inside) else q1,
+                    'whishi': inside.max() if len(inside) else q3,
+                    'fliers': fliers}
+
+        if range is None:
+            raise ValueError("range is required when aggregating chunks")
+        chunks = iter(data)
+        first = next(chunks, np.array([], dtype=float))
+        range = tuple(_as_float(np.asarray(range, dtype=_time_dtype(first))))
+        edges = np.linspace(range[0], range[1], resolution + 1)
+        counts = np.zeros(resolution, dtype=np.int64)
+        total, n, vmin, vmax = 0.0, 0, np.inf, -np.inf
+        # the max_fliers lowest and highest values seen so far: the whiskers are only
+        # known at the end, and any flier is among the extremes of some chunk
+        low, high = np.array([]), np.array([])
+        for values in ChartGenerator._chunks(itertools.chain([first], chunks)):
+            counts += np.histogram(values, bins=edges)[0]
+            total, n = total + values.sum(), n + len(values)
+            if len(values):
+                vmin, vmax = min(vmin, values.min()), max(vmax, values.max())
+            if len(values) and max_fliers:
+                k = min(max_fliers, len(values))
+                low = np.sort(np.concatenate([low, np.partition(values, k - 1)[:k]]))[:max_fliers]
+                high = np.sort(np.concatenate([high, np.partition(values, -k)[-k:]]))[-max_fliers:]
+        if not n:
+            return empty
+        cdf = np.concatenate([[0], np.cumsum(counts)]) / max(counts.sum(), 1)
+        q1, med, q3 = np.interp([0.25, 0.5, 0.75], cdf, edges)
+        lo, hi = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        fliers = np.concatenate([low[low < lo], high[high > hi]])
+        if len(fliers) > max_fliers:
+            fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype(int)]
+        return {'label': label, 'med': med, 'q1': q1, 'q3': q3, 'mean': total / max(n, 1),
+                'whislo': max(vmin, lo), 'whishi': min(vmax, hi),
+                'fliers': fliers}
+
+    @staticmethod
+    def correlation_matrix(df, columns=None, pairwise=False, dtype='float32'):
+        """
+        Compute the Pearson correlation matrix of numeric columns with matrix products.
+
+        Parameters:
+        - df: pandas DataFrame.
+        - columns: (optional) list of columns (defaults to all numeric columns).
+        - pairwise: (optional) if True, each pair uses the rows where both values are
+          present (like DataFrame.corr); if False, rows with any missing value are dropped.
+        - dtype: (optional) floating dtype of the computation ('float32' halves memory).
+
+        Returns:
+        - pandas DataFrame with the correlations.
+        """
+        columns = list(columns) if columns is not None else list(df.select_dtypes(include=np.number).columns)
+        X = df[columns].to_numpy(dtype=dtype, na_value=np.nan)
+        mask = np.isfinite(X)
+        if not pairwise:
+            X = X[mask.all(axis=1)]
+            X = X - X.mean(axis=0)
+            norms = np.sqrt((X * X).sum(axis=0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = (X.T @ X) / np.outer(norms, norms)
+        else:
+            # centering first keeps the sums small, which matters in float32
+            X = X - np.nanmean(X, axis=0)
+            M = mask.astype(dtype)
+            X0 = np.where(mask, X, 0).astype(dtype)
+            n = M.T @ M
+            sx = X0.T @ M
+            sxx = (X0 * X0).T @ M
+            sxy = X0.T @ X0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = n * sxy - sx * sx.T
+                corr = cov / np.sqrt((n * sxx - sx * sx) * (n * sxx.T - sx.T * sx.T))
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def render_batch(self, specs, output_dir, formats=('png',), n_jobs=1, dpi=100):
+        """
+        Render many charts to files headlessly, optionally in a process pool.
+
+        Each figure is saved and closed right away, so memory stays bounded no
+        matter how many charts are produced. Rendering uses the Agg backend (restored
+        afterwards when n_jobs is 1) and worker processes receive the DataFrame once,
+        when they start. If cache_dir is set, charts whose data and arguments did
+        not change are copied from the render cache.
+
+        Parameters:
+        - specs: list of dicts, each with
+          - 'method': name of a ChartGenerator method (e.g. 'line_chart').
+          - 'args' / 'kwargs': (optional) arguments for the method.
+          - 'name': (optional) output file stem (defaults to '<index>_<method>').
+          - 'data': (optional) DataFrame used instead of this generator's data,
+            for small per-chart tables such as value_counts().reset_index().
+        - output_dir: directory where the files are written.
+        - formats: (optional) file extensions, e.g. ('png', 'svg').
+        - n_jobs: (optional) number of worker processes; 1 renders in this process.
+        - dpi: (optional) resolution of raster outputs.
+
+        Returns:
+        - list with the written file paths of each spec, in the order of specs.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        tasks = [(i, spec, output_dir, tuple(formats), dpi) for i, spec in enumerate(specs)]
+        if n_jobs == 1:
+            # headless like the workers, then back to the caller's backend
+            backend = matplotlib.get_backend()
+            plt.switch_backend('Agg')
+            self._hash_memo = {}
+            try:
+                return [_render_spec(task, self) for task in tasks]
+            finally:
+                self._hash_memo = None
+                plt.switch_backend(backend)
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_render_worker,
+                                 initargs=(self.df, self.cache_dir, self.cache_max_bytes)) as executor:
+            return list(executor.map(_render_spec, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+    def _downsample_indices(self, x, y, downsample, max_points):
+        """
+        Row positions to plot for a series, or None to plot every row.
+
+        Parameters:
+        - x, y: columns (Series) for the x-axis and the values to preserve.
+        - downsample: 'lttb', 'minmax' or None (disabled).
+        - max_points: point budget; if None, DOWNSAMPLE_POINTS is used, but only
+          for series longer than DOWNSAMPLE_THRESHOLD.
+        """
+        n = len(y)
+        if not downsample:
+            return None
+        if max_points is None:
+            if n <= self.DOWNSAMPLE_THRESHOLD:
+                return None
+            max_points = self.DOWNSAMPLE_POINTS
+        if n <= max(max_points, 3):
+            return None
+        if downsample == 'minmax':
+            return _minmax_indices(_as_float(y), max_points)
+        if downsample == 'lttb':
+            return _lttb_indices(_as_float(x), _as_float(y), max_points)
+        raise ValueError("downsample must be 'lttb', 'minmax' or None")
+
+    def line_chart(self, x, y, title=None, xlabel=None, ylabel=None, legend=None,
+                   downsample='lttb', max_points=None):
         """
         Create a line chart using DataFrame columns.
 
@@ -27,12 +595,19 @@ class ChartGenerator:
         - xlabel: (optional) label for x-axis.
         - ylabel: (optional) label for y-axis.
         - legend: (optional) legend label for the line.
+        - downsample: (optional) 'lttb' (default), 'minmax' or None to plot every row.
+        - max_points: (optional) point budget; by default only series longer than
+          DOWNSAMPLE_THRESHOLD are reduced, to DOWNSAMPLE_POINTS points.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        ax.plot(self.df[x], self.df[y], label=legend)
+        xs, ys = self.df[x], self.df[y]
+        idx = self._downsample_indices(xs, ys, downsample, max_points)
+        if idx is not None:
+            xs, ys = xs.iloc[idx], ys.iloc[idx]
+        ax.plot(xs, ys, label=legend)
         if title: ax.set_title(title)
         if xlabel: ax.set_xlabel(xlabel)
         if ylabel: ax.set_ylabel(ylabel)
@@ -40,32 +615,90 @@ class ChartGenerator:
         plt.tight_layout()
         return fig, ax
 
-    def bar_chart(self, category_col, value_col, title=None, xlabel=None, ylabel=None, rotation=0):
+    def _category_values(self, category_col, value_col, agg, top_n, others_label):
+        """
+        Labels and values for bar_chart and pie_chart.
+
+        Without agg, each row is one category, as in a pre-aggregated frame.
+        With agg, rows are grouped by category_col in a single groupby. With
+        top_n, the top_n largest values are kept and the remaining categories are
+        merged into one others_label entry.
+        """
+        keys = list(category_col) if isinstance(category_col, (list, tuple)) else [category_col]
+        if agg is None:
+            if value_col is None:
+                raise ValueError("value_col is required unless agg is given")
+            values = self.df[value_col].reset_index(drop=True)
+            labels = _join_labels([self.df[k] for k in keys])
+            rest = None
+            if top_n is not None and len(values) > top_n:
+                top = values.nlargest(top_n).index
+                rest = values.drop(top).sum()
+                labels, values = labels[top.to_numpy()], values[top]
+            values = values.to_numpy()
+        else:
+            grouped = self.df.groupby(keys if len(keys) > 1 else keys[0], observed=True, sort=True)
+            if agg == 'mean' and top_n is not None:
+                # sum and count are enough to recover the mean of the merged categories
+                parts = grouped[value_col].agg(['sum', 'count'])
+                values = parts['sum'] / parts['count']
+            elif agg in ('size', 'count') and value_col is None:
+                values = grouped.size()
+            else:
+                values = grouped[value_col].agg(agg)
+            rest = None
+            if top_n is not None and len(values) > top_n:
+                top = values.nlargest(top_n).index
+                others = values.drop(top)
+                if agg in ('sum', 'count', 'size'):
+                    rest = others.sum()
+                elif agg in ('min', 'max'):
+                    rest = others.agg(agg)
+                elif agg == 'mean':
+                    rest = parts['sum'].drop(top).sum() / parts['count'].drop(top).sum()
+                else:
+                    # non-decomposable aggregations are recomputed on the remaining rows
+                    if len(keys) > 1:
+                        remaining = ~pd.MultiIndex.from_frame(self.df[keys]).isin(top)
+                    else:
+                        remaining = ~self.df[keys[0]].isin(top)
+                    rest = self.df.loc[remaining, value_col].agg(agg)
+                values = values[top]
+            index = values.index
+            levels = [index.get_level_values(i) for i in range(index.nlevels)]
+            labels = _join_labels(levels)
+            values = values.to_numpy()
+        if rest is not None:
+            labels = labels.append(pd.Index([others_label]))
+            values = np.append(values, rest)
+        return labels, values
+
+    def bar_chart(self, category_col, value_col=None, title=None, xlabel=None, ylabel=None, rotation=0,
+                  agg=None, top_n=None, others_label='Others'):
         """
         Create a bar chart using DataFrame columns.
 
         Parameters:
-        - category_col: string, name of the column for categories.
-        - value_col: string, name of the column for values.
+        - category_col: string or list of strings, column(s) for categories;
+          several columns are joined with ' - '.
+        - value_col: string, name of the column for values (optional when agg is
+          'size' or 'count').
         - title: (optional) chart title.
         - xlabel: (optional) label for x-axis.
         - ylabel: (optional) label for y-axis.
         - rotation: (optional) rotation angle for x-tick labels.
+        - agg: (optional) aggregation applied to raw rows grouped by category_col
+          ('sum', 'mean', 'count', 'size', ... or any groupby aggregation);
+          None plots one bar per row.
+        - top_n: (optional) keep the top_n largest bars and merge the rest into
+          a single others_label bar.
+        - others_label: (optional) label of the merged bar.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        # build labels: join multiple cols or take single
-        if isinstance(category_col, (list, tuple)):
-            labels = (
-                self.df[category_col]
-                .astype(str)
-                .agg(' - '.join, axis=1)
-            )
-        else:
-            labels = self.df[category_col].astype(str)
-        values = self.df[value_col]
+        labels, values = self._category_values(category_col, value_col, agg, top_n, others_label)
         ax.bar(labels, values)
         if title: ax.set_title(title)
         if xlabel: ax.set_xlabel(xlabel)
@@ -75,7 +708,8 @@ class ChartGenerator:
         plt.tight_layout()
         return fig, ax
 
-    def scatter_chart(self, x, y, title=None, xlabel=None, ylabel=None, color=None):
+    def scatter_chart(self, x, y, title=None, xlabel=None, ylabel=None, color=None,
+                      density='auto', bins=200, cmap='viridis', sample_overlay=0, seed=None):
         """
         Create a scatter chart using DataFrame columns.
 
@@ -86,101 +720,173 @@ class ChartGenerator:
         - xlabel: (optional) label for x-axis.
         - ylabel: (optional) label for y-axis.
         - color: (optional) marker color.
+        - density: (optional) 'auto' (default) draws a binned 2D density instead of
+          markers above DENSITY_THRESHOLD rows; 'hist2d' or 'hexbin' force a density
+          plot; None always draws markers.
+        - bins: (optional) number of bins per axis for the density plot.
+        - cmap: (optional) colormap of the density plot.
+        - sample_overlay: (optional) number of points of a stratified sample drawn
+          on top of the density plot.
+        - seed: (optional) random seed for the overlay sample.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        ax.scatter(self.df[x], self.df[y], c=color)
+        if density == 'auto':
+            density = 'hist2d' if len(self.df) > self.DENSITY_THRESHOLD else None
+        if not density:
+            ax.scatter(self.df[x], self.df[y], c=color)
+        else:
+            xs, ys = _as_float(self.df[x]), _as_float(self.df[y])
+            counts, extent, cells, finite = _bin_2d(xs, ys, bins)
+            if density == 'hexbin':
+                image = ax.hexbin(xs[finite], ys[finite], gridsize=bins, cmap=cmap, bins='log', mincnt=1)
+            elif density == 'hist2d':
+                from matplotlib.colors import LogNorm
+                image = ax.imshow(np.ma.masked_equal(counts, 0), origin='lower', extent=extent,
+                                  aspect='auto', cmap=cmap, norm=LogNorm(), interpolation='nearest')
+            else:
+                raise ValueError("density must be 'auto', 'hist2d', 'hexbin' or None")
+            fig.colorbar(image, ax=ax, label='count')
+            if sample_overlay:
+                rng = np.random.default_rng(seed)
+                pos = _stratified_sample(cells, sample_overlay, rng)
+                ax.scatter(xs[finite][pos], ys[finite][pos], s=2, c=color or 'k', alpha=0.5)
         if title: ax.set_title(title)
         if xlabel: ax.set_xlabel(xlabel)
         if ylabel: ax.set_ylabel(ylabel)
         plt.tight_layout()
         return fig, ax
 
-    def histogram(self, column, bins=10, title=None, xlabel=None, ylabel=None):
+    def histogram(self, column=None, bins=10, title=None, xlabel=None, ylabel=None, stats=None):
         """
         Create a histogram using a DataFrame column.
 
         Parameters:
-        - column: string, name of the column to plot.
-        - bins: (optional) number of histogram bins.
+        - column: string, name of the column to plot (not needed when stats is given).
+        - bins: (optional) number of histogram bins, bin edges or a numpy bin rule
+          such as 'auto'.
         - title: (optional) chart title.
         - xlabel: (optional) label for x-axis.
         - ylabel: (optional) label for y-axis.
+        - stats: (optional) precomputed aggregates from histogram_stats; the data
+          is not scanned again.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        ax.hist(self.df[column], bins=bins)
+        if stats is None:
+            stats = self.histogram_stats(self.df[column], bins=bins)
+        edges = stats['edges']
+        if np.issubdtype(np.asarray(edges).dtype, np.timedelta64):
+            edges = edges / np.timedelta64(1, 's')  # matplotlib has no timedelta axis; plot seconds
+        ax.stairs(stats['counts'], edges, fill=True)
         if title: ax.set_title(title)
         if xlabel: ax.set_xlabel(xlabel)
         if ylabel: ax.set_ylabel(ylabel)
         plt.tight_layout()
         return fig, ax
 
-    def pie_chart(self, label_col, size_col, title=None, autopct='%1.1f%%'):
+    def pie_chart(self, label_col, size_col=None, title=None, autopct='%1.1f%%',
+                  agg=None, top_n=None, others_label='Others'):
         """
         Create a pie chart using DataFrame columns.
 
         Parameters:
-        - label_col: string, name of the column for labels.
-        - size_col: string, name of the column for sizes.
+        - label_col: string or list of strings, column(s) for labels.
+        - size_col: string, name of the column for sizes (optional when agg is
+          'size' or 'count').
         - title: (optional) chart title.
         - autopct: (optional) format string for percentages.
+        - agg: (optional) aggregation applied to raw rows grouped by label_col,
+          as in bar_chart.
+        - top_n: (optional) keep the top_n largest slices and merge the rest into
+          a single others_label slice.
+        - others_label: (optional) label of the merged slice.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        ax.pie(self.df[size_col], labels=self.df[label_col], autopct=autopct)
+        labels, sizes = self._category_values(label_col, size_col, agg, top_n, others_label)
+        ax.pie(sizes, labels=labels, autopct=autopct)
         if title: ax.set_title(title)
         plt.tight_layout()
         return fig, ax
 
-    def box_plot(self, columns, title=None, ylabel=None):
+    def box_plot(self, columns=None, title=None, ylabel=None, stats=None):
         """
         Create a box plot for one or more DataFrame columns.
 
         Parameters:
-        - columns: list of strings, names of the columns to include.
+        - columns: list of strings, names of the columns to include (not needed
+          when stats is given).
         - title: (optional) chart title.
         - ylabel: (optional) label for y-axis.
+        - stats: (optional) list of precomputed aggregates from box_stats; the
+          data is not scanned again.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        ax.boxplot([self.df[col] for col in columns], labels=columns)
+        if stats is None:
+            stats = [self.box_stats(self.df[col], label=col) for col in columns]
+        ax.bxp(stats)
         if title: ax.set_title(title)
         if ylabel: ax.set_ylabel(ylabel)
         plt.tight_layout()
         return fig, ax
 
-    def heatmap(self, title=None, cmap='viridis'):
+    def heatmap(self, title=None, cmap='viridis', mode='raw', columns=None, pairwise=False,
+                dtype='float32', max_shape=(1000, 1000), max_ticks=40):
         """
-        Create a heatmap of the entire DataFrame.
+        Create a heatmap of the entire DataFrame or of its correlation matrix.
 
         Parameters:
         - title: (optional) chart title.
         - cmap: (optional) colormap name.
+        - mode: (optional) 'raw' draws the DataFrame values; 'corr' draws the
+          correlation matrix of the numeric columns (see correlation_matrix).
+        - columns: (optional) columns used in 'corr' mode.
+        - pairwise: (optional) pairwise-complete correlations in 'corr' mode.
+        - dtype: (optional) floating dtype of the correlation computation.
+        - max_shape: (optional) larger matrices are block-averaged down to this
+          (rows, columns) shape before drawing.
+        - max_ticks: (optional) maximum number of tick labels per axis.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
-        cax = ax.imshow(self.df.values, cmap=cmap)
-        ax.set_xticks(range(len(self.df.columns)))
-        ax.set_xticklabels(self.df.columns)
-        ax.set_yticks(range(len(self.df.index)))
-        ax.set_yticklabels(self.df.index)
+        if mode == 'corr':
+            data = self.correlation_matrix(self.df, columns, pairwise=pairwise, dtype=dtype)
+            limits = {'vmin': -1, 'vmax': 1}
+        elif mode == 'raw':
+            data = self.df
+            limits = {}
+        else:
+            raise ValueError("mode must be 'raw' or 'corr'")
+        values = data.to_numpy(dtype=float, na_value=np.nan)
+        rows, cols = values.shape
+        # the extent keeps axis coordinates in original row/column positions after block averaging
+        cax = ax.imshow(_block_mean(values, max_shape), cmap=cmap, aspect='auto',
+                        interpolation='nearest', extent=(-0.5, cols - 0.5, rows - 0.5, -0.5), **limits)
+        positions, labels = _decimated_ticks(data.columns, max_ticks)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(labels, rotation=90 if mode == 'corr' or cols > 10 else 0)
+        positions, labels = _decimated_ticks(data.index, max_ticks)
+        ax.set_yticks(positions)
+        ax.set_yticklabels(labels)
         if title: ax.set_title(title)
         fig.colorbar(cax)
         plt.tight_layout()
         return fig, ax
 
-    def area_chart(self, x, ys, labels=None, title=None, xlabel=None, ylabel=None):
+    def area_chart(self, x, ys, labels=None, title=None, xlabel=None, ylabel=None,
+                   downsample='lttb', max_points=None):
         """
         Create an area (stack) chart using DataFrame columns.
 
@@ -191,13 +897,21 @@ class ChartGenerator:
         - title: (optional) chart title.
         - xlabel: (optional) label for x-axis.
         - ylabel: (optional) label for y-axis.
+        - downsample: (optional) 'lttb' (default), 'minmax' or None; the points are
+          chosen on the stack total so all layers share the same x positions.
+        - max_points: (optional) point budget, as in line_chart.
 
         Returns:
         - fig, ax: Matplotlib figure and axes objects.
         """
         fig, ax = plt.subplots()
+        xs = self.df[x]
         data = [self.df[col] for col in ys]
-        ax.stackplot(self.df[x], *data, labels=labels)
+        idx = self._downsample_indices(xs, self.df[list(ys)].sum(axis=1), downsample, max_points)
+        if idx is not None:
+            xs = xs.iloc[idx]
+            data = [col.iloc[idx] for col in data]
+        ax.stackplot(xs, *data, labels=labels if labels is not None else ())
         if title: ax.set_title(title)
         if xlabel: ax.set_xlabel(xlabel)
         if ylabel: ax.set_ylabel(ylabel)
@@ -205,7 +919,45 @@ class ChartGenerator:
         plt.tight_layout()
         return fig, ax
 
-    def scatter_matrix(self, columns=None, diagonal='hist', figsize=(8, 8), **kwargs):
+    def fan_chart(self, x, center, bands, history=None, title=None, xlabel=None, ylabel=None,
+                  color='tab:blue'):
+        """
+        Create a fan chart (e.g. a forecast): a central line with shaded bands
+        between pairs of columns, such as quantiles per period.
+
+        Parameters:
+        - x: string, name of the column for x-axis.
+        - center: string, name of the column for the central line (e.g. the median).
+        - bands: list of (lower_col, upper_col) pairs, widest first; inner bands
+          are drawn darker.
+        - history: (optional) pandas Series of observed values drawn in black,
+          with the x positions taken from its index.
+        - title: (optional) chart title.
+        - xlabel: (optional) label for x-axis.
+        - ylabel: (optional) label for y-axis.
+        - color: (optional) color of the line and bands.
+
+        Returns:
+        - fig, ax: Matplotlib figure and axes objects.
+        """
+        fig, ax = plt.subplots()
+        xs = self.df[x]
+        for i, (lower, upper) in enumerate(bands):
+            alpha = 0.15 + 0.3 * i / max(len(bands) - 1, 1)
+            ax.fill_between(xs, self.df[lower], self.df[upper], color=color, alpha=alpha,
+                            linewidth=0, label=f'{lower} - {upper}')
+        ax.plot(xs, self.df[center], color=color, label=center)
+        if history is not None:
+            ax.plot(history.index, history.to_numpy(), color='black', label='history')
+        if title: ax.set_title(title)
+        if xlabel: ax.set_xlabel(xlabel)
+        if ylabel: ax.set_ylabel(ylabel)
+        ax.legend()
+        plt.tight_layout()
+        return fig, ax
+
+    def scatter_matrix(self, columns=None, diagonal='hist', figsize=(8, 8), binned='auto', bins=50,
+                       sample=None, n_jobs=1, seed=None, cmap='viridis', **kwargs):
         """
         Create a scatter matrix (pair plot) for DataFrame columns.
 
@@ -213,13 +965,130 @@ class ChartGenerator:
         - columns: list of strings, names of the columns to include (defaults to all).
         - diagonal: (optional) type of plot on diagonal ('hist', 'kde').
         - figsize: (optional) figure size tuple.
+        - binned: (optional) 'auto' (default) draws 2D histograms off the diagonal and
+          1D histograms on it above SCATTER_MATRIX_THRESHOLD rows; True/False force it.
+        - bins: (optional) number of bins per axis in binned panels.
+        - sample: (optional) draw a regular scatter matrix of a stratified sample of
+          this many rows instead of the full data.
+        - n_jobs: (optional) processes used to compute the binned panels.
+        - seed: (optional) random seed for the sample.
+        - cmap: (optional) colormap of the binned panels.
         - kwargs: additional plotting keyword arguments.
 
         Returns:
         - fig, axes: Matplotlib figure and axes array.
         """
         data = self.df[columns] if columns else self.df
-        axes = scatter_matrix(data, diagonal=diagonal, figsize=figsize, **kwargs)
-        fig = axes[0, 0].get_figure()
-        plt.tight_layout()
+        if sample is not None and len(data) > sample:
+            numeric = data.select_dtypes(include=np.number)
+            # stratify on the joint decile of every column so tails are represented
+            deciles = np.zeros((len(numeric), numeric.shape[1]), dtype=np.int8)
+            for i, col in enumerate(numeric.columns):
+                decile = pd.qcut(numeric[col], 10, labels=False, duplicates='drop')
+                deciles[:, i] = decile.fillna(10).to_numpy()
+            # one id per distinct row of deciles, for any number of columns
+            cells = (np.unique(deciles, axis=0, return_inverse=True)[1].ravel()
+                     if deciles.shape[1] else np.zeros(len(numeric), dtype=np.intp))
+            rng = np.random.default_rng(seed)
+            data = data.iloc[np.sort(_stratified_sample(cells, sample, rng))]
+            binned = False
+        if binned == 'auto':
+            binned = len(data) > self.SCATTER_MATRIX_THRESHOLD
+        if not binned:
+            axes = scatter_matrix(data, diagonal=diagonal, figsize=figsize, **kwargs)
+            fig = axes[0, 0].get_figure()
+            plt.tight_layout()
+            return fig, axes
+
+        numeric = data.select_dtypes(include=np.number)
+        names = list(numeric.columns)
+        k = len(names)
+        # one pass per column: bin codes (-1 for missing) reused by every pair
+        codes, edges = [], []
+        for col in names:
+            values = _as_float(numeric[col])
+            finite = np.isfinite(values)
+            lo, hi = (values[finite].min(), values[finite].max()) if finite.any() else (0.0, 1.0)
+            hi = hi if hi > lo else lo + 1
+            code = np.full(len(values), -1, dtype=np.int32)
+            code[finite] = np.clip(((values[finite] - lo) * (bins / (hi - lo))).astype(np.int32), 0, bins - 1)
+            codes.append(code)
+            edges.append(np.linspace(lo, hi, bins + 1))
+
+        pairs = [(i, j) for i in range(k) for j in range(i + 1, k)]
+        if n_jobs > 1 and len(pairs) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            batches = [pairs[w::n_jobs] for w in range(n_jobs)]
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = executor.map(_pair_counts, [(codes, bins, batch) for batch in batches])
+                counts = {pair: c for batch, res in zip(batches, results) for pair, c in zip(batch, res)}
+        else:
+            counts = dict(zip(pairs, _pair_counts((codes, bins, pairs))))
+
+        from matplotlib.colors import LogNorm
+        fig, axes = plt.subplots(k, k, figsize=figsize, squeeze=False)
+        for i in range(k):
+            for j in range(k):
+                ax = axes[i, j]
+                if i == j:
+                    hist = np.bincount(codes[i][codes[i] >= 0], minlength=bins)
+                    if diagonal == 'kde':
+                        kernel = np.exp(-0.5 * (np.arange(-4, 5) / 1.5) ** 2)
+                        centers = (edges[i][:-1] + edges[i][1:]) / 2
+                        ax.plot(centers, np.convolve(hist, kernel / kernel.sum(), mode='same'))
+                    else:
+                        ax.stairs(hist, edges[i], fill=True)
+                else:
+                    # row i is the y column, column j the x column, as in pandas;
+                    # _pair_counts puts the first column of the pair on the rows
+                    grid = counts[(j, i)].T if i > j else counts[(i, j)]
+                    ax.imshow(np.ma.masked_equal(grid, 0), origin='lower', aspect='auto', cmap=cmap,
+                              norm=LogNorm(), interpolation='nearest',
+                              extent=(edges[j][0], edges[j][-1], edges[i][0], edges[i][-1]))
+                ax.set_xlabel(names[j] if i == k - 1 else '')
+                ax.set_ylabel(names[i] if j == 0 else '')
+                ax.tick_params(labelbottom=i == k - 1, labelleft=j == 0, labelsize=7)
+        # tight_layout costs seconds on a k x k grid; a fixed layout is enough here
+        fig.subplots_adjust(wspace=0.05, hspace=0.05)
         return fig, axes
+
+
+_worker_generator = None
+
+
+def _init_render_worker(df, cache_dir=None, cache_max_bytes=512 * 2**20):
+    """
+    Process pool initializer: headless backend and one ChartGenerator per worker.
+    """
+    global _worker_generator
+    plt.switch_backend('Agg')
+    _worker_generator = ChartGenerator(df, cache_dir, cache_max_bytes)
+    _worker_generator._hash_memo = {}
+
+
+def _render_spec(task, generator=None):
+    """
+    Render one render_batch spec, save it in every format and close the figure.
+    """
+    index, spec, output_dir, formats, dpi = task
+    generator = generator or _worker_generator
+    if spec.get('data') is not None:
+        generator = ChartGenerator(spec['data'], generator.cache_dir, generator.cache_max_bytes)
+    method = spec['method']
+    args, kwargs = tuple(spec.get('args', ())), spec.get('kwargs', {})
+    name = spec.get('name') or f"{index:03d}_{method}"
+    paths = [os.path.join(output_dir, f"{name}.{fmt}") for fmt in formats]
+
+    if generator.cache_dir:
+        cached = generator._render_to_cache(method, args, kwargs, formats, dpi)
+        for source, path in zip(cached, paths):
+            shutil.copyfile(source, path)
+        return paths
+
+    fig, _ = getattr(generator, method)(*args, **kwargs)
+    try:
+        for path in paths:
+            fig.savefig(path, dpi=dpi)
+    finally:
+        plt.close(fig)
+    return paths
@@ -0,0 +1,298 @@
+import warnings
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.stats import chi2_contingency
+
+
+def corrigir_p_valores(p_valores, metodo='fdr_bh'):
+    """
+    Correção para comparações múltiplas.
+    - metodo: 'fdr_bh' (Benjamini-Hochberg), 'holm' (Holm-Bonferroni) ou None
+    Retorna um array com os p-valores ajustados, na mesma ordem da entrada.
+    """
+    p = np.asarray(p_valores, dtype=float)
+    if metodo is None:
+        return p
+    validos = ~np.isnan(p)
+    m = validos.sum()
+    ajustados = np.full_like(p, np.nan)
+    ordem = np.argsort(p[validos])
+    ordenados = p[validos][ordem]
+
+    if metodo == 'fdr_bh':
+        ajuste = ordenados * m / np.arange(1, m + 1)
+        ajuste = np.minimum.accumulate(ajuste[::-1])[::-1]
+    elif metodo == 'holm':
+        ajuste = ordenados * (m - np.arange(m))
+        ajuste = np.maximum.accumulate(ajuste)
+    else:
+        raise ValueError("metodo deve ser 'fdr_bh', 'holm' ou None.")
+
+    resultado = np.empty(m)
+    resultado[ordem] = np.minimum(ajuste, 1.0)
+    ajustados[validos] = resultado
+    return ajustados
+
+
+def teste_t_em_lote(df, coluna_grupo, grupo1, grupo2, colunas=None, equal_var=True,
+                    alpha=0.05, correcao='fdr_bh'):
+    """
+    Teste t-Student para várias colunas numéricas de uma vez.
+    Em vez de filtrar o DataFrame por coluna, calcula média, variância e contagem
+    de todas as colunas em uma única agregação agrupada e deriva as estatísticas t.
+    - colunas: colunas numéricas a testar (padrão: todas)
+    - equal_var: True para variância combinada, False para Welch
+    - correcao: correção de comparações múltiplas ('fdr_bh', 'holm' ou None)
+    Retorna um DataFrame com uma linha por coluna testada.
+    """
+    if colunas is None:
+        colunas = df.select_dtypes(include=np.number).columns.drop(coluna_grupo, errors='ignore')
+    agregado = (
+        df.loc[df[coluna_grupo].isin([grupo1, grupo2]), list(colunas)]
+        .groupby(df[coluna_grupo])
+        .agg(['mean', 'var', 'count'])
+    )
+    g1, g2 = agregado.loc[grupo1], agregado.loc[grupo2]
+    media1, var1, n1 = (g1.xs(s, level=1).astype(float) for s in ('mean', 'var', 'count'))
+    media2, var2, n2 = (g2.xs(s, level=1).astype(float) for s in ('mean', 'var', 'count'))
+
+    if equal_var:
+        gl = n1 + n2 - 2
+        var_comb = ((n1 - 1) * var1 + (n2 - 1) * var2) / gl
+        erro = np.sqrt(var_comb * (1 / n1 + 1 / n2))
+    else:
+        a, b = var1 / n1, var2 / n2
+        erro = np.sqrt(a + b)
+        gl = (a + b) ** 2 / (a ** 2 / (n1 - 1) + b ** 2 / (n2 - 1))
+
+    t_stat = (media1 - media2) / erro
+    p = 2 * stats.t.sf(np.abs(t_stat), gl)
+    p_ajustado = corrigir_p_valores(p, correcao)
+
+    resultado = pd.DataFrame({
+        'coluna': media1.index,
+        f'media_{grupo1}': media1.to_numpy(),
+        f'media_{grupo2}': media2.to_numpy(),
+        'n1': n1.to_numpy(),
+        'n2': n2.to_numpy(),
+        't_statistic': t_stat.to_numpy(),
+        'p_value': np.asarray(p),
+        'p_ajustado': p_ajustado,
+    })
+    resultado['decisão'] = np.where(resultado['p_ajustado'] < alpha,
+                                    "rejeita H0 (médias diferentes)",
+                                    "falha em rejeitar H0 (sem diferença)")
+    return resultado
+
+
+def teste_chi_quadrado_em_lote(df, colunas=None, alpha=0.05, correcao='fdr_bh', limite_cardinalidade=1000):
+    """
+    Teste de independência qui-quadrado para todos os pares de colunas categóricas.
+    Cada coluna é codificada em inteiros uma única vez, e as tabelas de
+    contingência de cada par saem das combinações de códigos que de fato
+    aparecem (np.unique), sem alocar a tabela completa k1 x k2.
+    - colunas: colunas categóricas a testar (padrão: object/category)
+    - correcao: correção de comparações múltiplas ('fdr_bh', 'holm' ou None)
+    - limite_cardinalidade: colunas com mais valores distintos (identificadores
+      como session_id) ficam de fora, com um aviso; None testa todas
+    Retorna um DataFrame com uma linha por par de colunas.
+    """
+    if colunas is None:
+        colunas = df.select_dtypes(include=['object', 'category', 'string']).columns
+    codigos = {}
+    for col in colunas:
+        cod, niveis = pd.factorize(df[col])
+        if limite_cardinalidade is not None and len(niveis) > limite_cardinalidade:
+            warnings.warn(f"Coluna '{col}' ignorada: {len(niveis)} valores distintos "
+                          f"(limite_cardinalidade={limite_cardinalidade}).")
+            continue
+        codigos[col] = (cod, len(niveis))
+
+    linhas = []
+    for col1, col2 in combinations(codigos, 2):
+        (c1, k1), (c2, k2) = codigos[col1], codigos[col2]
+        validos = (c1 >= 0) & (c2 >= 0)
+        celulas, contagens = np.unique(c1[validos].astype(np.int64) * k2 + c2[validos], return_counts=True)
+        _, linha = np.unique(celulas // k2, return_inverse=True)
+        _, coluna = np.unique(celulas % k2, return_inverse=True)
+        tabela = np.zeros((linha.max(initial=-1) + 1, coluna.max(initial=-1) + 1), dtype=np.int64)
+        tabela[linha, coluna] = contagens
+        if min(tabela.shape) < 2:
+            chi2, p, dof = np.nan, np.nan, 0
+        else:
+            chi2, p, dof, _ = chi2_contingency(tabela)
+        linhas.append({'coluna_1': col1, 'coluna_2': col2, 'chi2': chi2, 'p_value': p, 'dof': dof})
+
+    resultado = pd.DataFrame(linhas, columns=['coluna_1', 'coluna_2', 'chi2', 'p_value', 'dof'])
+    resultado['p_ajustado'] = corrigir_p_valores(resultado['p_value'], correcao)
+    resultado['decisão'] = np.where(resultado['p_ajustado'] < alpha,
+                                    "rejeita H0 (não-independentes)",
+                                    "falha em rejeitar H0 (independentes)")
+    return resultado
+
+
+def _momentos(celulas, n_celulas, colunas):
+    """Soma de z z' por célula, com z = [1, colunas...]: array (n_celulas, p, p)."""
+    z = [None] + list(colunas)
+    momentos = np.empty((n_celulas, len(z), len(z)))
+    for i in range(len(z)):
+        for j in range(i, len(z)):
+            pesos = z[j] if i == 0 else z[i] * z[j]
+            momentos[:, i, j] = momentos[:, j, i] = np.bincount(celulas, weights=pesos, minlength=n_celulas)
+    return momentos
+
+
+def _media_covariancia(momentos):
+    """Médias e covariâncias (ddof=1) de z[1:] a partir da soma de z z'."""
+    n = momentos[..., 0, 0]
+    media = momentos[..., 0, 1:] / np.maximum(n, 1)[..., None]
+    covariancia = (momentos[..., 1:, 1:] - n[..., None, None] * media[..., :, None] * media[..., None, :]) \
+        / np.maximum(n - 1, 1)[..., None, None]
+    return n, media, covariancia
+
+
+def _expandir_dummies(momentos, dummies):
+    """
+    Acrescenta colunas constantes por célula (dummies das categóricas) aos
+    momentos de cada célula: z = [1, x..., y] vira [1, x..., d..., y].
+    """
+    n_celulas, p, _ = momentos.shape
+    k = dummies.shape[1]
+    transformacao = np.zeros((n_celulas, p + k, p))
+    transformacao[:, :p - 1, :p - 1] = np.eye(p - 1)
+    transformacao[:, p - 1:p - 1 + k, 0] = dummies
+    transformacao[:, -1, -1] = 1
+    return transformacao @ momentos @ transformacao.transpose(0, 2, 1)
+
+
+def _estimativas(momentos, tratamento, dummies, estratos, k):
+    """
+    Diferença tratamento - controle de uma métrica (última coluna dos momentos)
+    por cada estimador. Retorna {metodo: (diferenca, variancia, graus de liberdade)}.
+    """
+    por_grupo = np.stack([momentos[~tratamento].sum(axis=0), momentos[tratamento].sum(axis=0)])
+    n, media, cov = _media_covariancia(por_grupo)
+    total = n.sum()
+    resultado = {}
+
+    # sem ajuste (Welch)
+    var_y = cov[:, -1, -1] / n
+    resultado['sem_ajuste'] = (media[1, -1] - media[0, -1], var_y.sum(),
+                               var_y.sum() ** 2 / (var_y ** 2 / (n - 1)).sum())
+
+    # CUPED: theta da covariância combinada dos dois grupos
+    if k:
+        combinada = ((n - 1)[:, None, None] * cov).sum(axis=0) / (total - 2)
+        theta = np.linalg.pinv(combinada[:k, :k]) @ combinada[:k, -1]
+        variancia = (cov[:, -1, -1] - 2 * cov[:, :k, -1] @ theta + theta @ cov[:, :k, :k] @ theta) / n
+        diferenca = (media[1, -1] - media[0, -1]) - (media[1, :k] - media[0, :k]) @ theta
+        resultado['cuped'] = (diferenca, variancia.sum(), total - 2 - k)
+
+    # regressão com inclinações separadas por grupo (Lin, 2013), covariáveis
+    # centradas na média geral; categóricas entram como dummies
+    if k or dummies.shape[1]:
+        expandidos = _expandir_dummies(momentos, dummies)
+        grupos = np.stack([expandidos[~tratamento].sum(axis=0), expandidos[tratamento].sum(axis=0)])
+        n, media, cov = _media_covariancia(grupos)
+        media_geral = grupos.sum(axis=0)[0, 1:-1] / total
+        q = media.shape[1] - 1
+        beta = np.stack([np.linalg.pinv(cov[g, :q, :q]) @ cov[g, :q, -1] for g in range(2)])
+        ajustadas = media[:, -1] - ((media[:, :q] - media_geral) * beta).sum(axis=1)
+        residuo = (cov[:, -1, -1] - (beta * cov[:, :q, -1]).sum(axis=1)) * (n - 1) / np.maximum(n - 1 - q, 1)
+        _, _, cov_total = _media_covariancia(grupos.sum(axis=0))
+        delta = beta[1] - beta[0]
+        variancia = (residuo / n).sum() + delta @ cov_total[:q, :q] @ delta / total
+        resultado['regressao'] = (ajustadas[1] - ajustadas[0], variancia, total - 2 * (q + 1))
+
+    # pós-estratificação: média das diferenças por estrato, com o peso do estrato na amostra
+    if estratos is not None:
+        codigos, n_estratos = estratos
+        cel = np.zeros((2, n_estratos) + momentos.shape[1:])
+        np.add.at(cel, (tratamento.astype(int), codigos), momentos)
+        n, media, cov = _media_covariancia(cel)
+        validos = (n >= 2).all(axis=0)
+        pesos = n[:, validos].sum(axis=0) / n[:, validos].sum()
+        diferencas = media[1, validos, -1] - media[0, validos, -1]
+        variancias = (cov[:, validos, -1, -1] / n[:, validos]).sum(axis=0)
+        resultado['pos_estratificacao'] = ((pesos * diferencas).sum(), (pesos ** 2 * variancias).sum(),
+                                           n[:, validos].sum() - 2 * validos.sum())
+    return resultado
+
+
+def teste_ab_ajustado(df, coluna_grupo, controle, tratamento, metricas, covariaveis=None,
+                      categoricas=None, estratos=None, alpha=0.05):
+    """
+    Teste A/B com redução de variância por covariáveis medidas antes do
+    experimento (que não podem ser afetadas pela versão exibida).
+    Para cada métrica, compara o estimador sem ajuste com:
+       - 'cuped': y - theta * (x - média de x), com theta da covariância combinada
+       - 'regressao': regressão de y nas covariáveis e nas dummies das categóricas,
+         com coeficientes separados por grupo (ajuste de Lin)
+       - 'pos_estratificacao': diferença média dentro de cada estrato, ponderada
+         pelo tamanho do estrato
+    Todos os estimadores saem dos mesmos momentos (somas de z z') agregados por
+    célula grupo x categóricas x estratos em uma única passagem pelos dados.
+    - metricas: colunas de resultado; NaN indica que a métrica não se aplica à linha
+      (ex.: tempo de leitura de quem não clicou)
+    - covariaveis: colunas numéricas usadas no CUPED e na regressão
+    - categoricas: colunas categóricas usadas como dummies na regressão
+    - estratos: colunas que definem os estratos (padrão: as categóricas)
+    A coluna 'reducao_variancia' é a fração da variância sem ajuste eliminada;
+    para a mesma precisão, bastam (1 - reducao_variancia) vezes os leitores.
+    Retorna um DataFrame com uma linha por métrica e estimador.
+    """
+    covariaveis = list(covariaveis or [])
+    categoricas = list(categoricas or [])
+    estratos = list(estratos) if estratos is not None else list(categoricas)
+    colunas_celula = list(dict.fromkeys(categoricas + estratos))
+
+    usadas = list(dict.fromkeys([coluna_grupo] + colunas_celula + covariaveis + list(metricas)))
+    dados = df.loc[df[coluna_grupo].isin([controle, tratamento]), usadas]
+    agrupado = dados.groupby([coluna_grupo] + colunas_celula, observed=True, sort=True)
+    celulas = agrupado.ngroup().to_numpy()
+    chaves = agrupado.size().index.to_frame(index=False)
+    n_celulas = len(chaves)
+    e_tratamento = (chaves[coluna_grupo] == tratamento).to_numpy()
+
+    dummies = np.column_stack([
+        (chaves[col].to_numpy()[:, None] == pd.unique(chaves[col].to_numpy())[1:]).astype(float)
+        for col in categoricas
+    ]) if categoricas else np.zeros((n_celulas, 0))
+    codigos_estrato = None
+    if estratos:
+        codigos, niveis = pd.factorize(pd.MultiIndex.from_frame(chaves[estratos]))
+        codigos_estrato = (codigos, len(niveis))
+
+    x = dados[covariaveis].to_numpy(dtype=float)
+    validos_x = (celulas >= 0) & ~np.isnan(x).any(axis=1)
+    z = stats.norm.ppf(1 - alpha / 2)
+    linhas = []
+    for metrica in metricas:
+        y = dados[metrica].to_numpy(dtype=float)
+        validos = validos_x & ~np.isnan(y)
+        colunas = [x[validos, i] for i in range(x.shape[1])] + [y[validos]]
+        momentos = _momentos(celulas[validos], n_celulas, colunas)
+        n = momentos[:, 0, 0]
+        estimativas = _estimativas(momentos, e_tratamento, dummies, codigos_estrato, len(covariaveis))
+        variancia_base = estimativas['sem_ajuste'][1]
+        for metodo, (diferenca, variancia, gl) in estimativas.items():
+            erro = np.sqrt(variancia)
+            t_stat = diferenca / erro
+            quantil = stats.t.ppf(1 - alpha / 2, gl) if np.isfinite(gl) else z
+            linhas.append({
+                'metrica': metrica,
+                'metodo': metodo,
+                'n_controle': n[~e_tratamento].sum(),
+                'n_tratamento': n[e_tratamento].sum(),
+                'diferenca': diferenca,
+                'erro_padrao': erro,
+                't_statistic': t_stat,
+                'p_value': 2 * stats.t.sf(np.abs(t_stat), gl),
+                'ic_inf': diferenca - quantil * erro,
+                'ic_sup': diferenca + quantil * erro,
+                'reducao_variancia': 1 - variancia / variancia_base,
+            })
+    return pd.DataFrame(linhas)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow, o CSV é lido normalmente, sem cache
+    feather = None
+
+
+def _assinatura_arquivo(caminho, verificacao):
+    """
+    Identifica o conteúdo do CSV.
+    - 'conteudo': hash BLAKE2 dos bytes do arquivo (seguro, custo de uma leitura sequencial)
+    - 'rapida': tamanho + data de modificação (instantâneo)
+    """
+    info = os.stat(caminho)
+    if verificacao == 'rapida':
+        return f"{info.st_size}-{info.st_mtime_ns}"
+    if verificacao != 'conteudo':
+        raise ValueError("verificacao deve ser 'conteudo' ou 'rapida'.")
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 24), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _ler_csv(caminho, esquema, **kwargs):
+    numericas = list(esquema.get('numericas', []))
+    dtypes = {col: 'category' for col in esquema.get('categoricas', [])}
+    dtypes.update(esquema.get('dtypes', {}))
+
+    df = pd.read_csv(caminho, dtype=dtypes or None, **kwargs)
+    for col in esquema.get('datas', []):
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in numericas:
+        # valores inválidos viram NaN, como no pd.to_numeric(..., errors='coerce') dos notebooks
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def carregar_csv(caminho, esquema=None, diretorio_cache=None, verificacao='conteudo', **kwargs):
+    """
+    Lê um CSV aplicando um esquema de tipos e mantém uma cópia colunar (Feather)
+    em cache. Nas próximas leituras do mesmo arquivo, o cache é mapeado em
+    memória em vez de repetir o parse do CSV. Colunas numéricas sem nulos
+    apontam direto para o arquivo mapeado (sem cópia, somente leitura); as
+    demais (texto, categorias, colunas com nulos) são copiadas para o pandas.
+    - esquema: dicionário opcional com
+       - 'dtypes': {coluna: dtype} repassado ao read_csv
+       - 'datas': colunas convertidas com pd.to_datetime
+       - 'numericas': colunas convertidas com pd.to_numeric(errors='coerce')
+       - 'categoricas': colunas lidas como category
+    - diretorio_cache: onde guardar o cache (padrão: `.cache_csv` ao lado do CSV).
+      Só a versão mais recente de cada CSV e conjunto de opções é mantida.
+    - verificacao: 'conteudo' (hash do arquivo) ou 'rapida' (tamanho e data de modificação)
+    - kwargs: parâmetros adicionais do pd.read_csv (sep, encoding, ...)
+    Retorna o DataFrame.
+    """
+    esquema = esquema or {}
+    if feather is None:
+        warnings.warn("pyarrow não está instalado; o CSV será lido sem cache.")
+        return _ler_csv(caminho, esquema, **kwargs)
+
+    diretorio_cache = diretorio_cache or os.path.join(os.path.dirname(os.path.abspath(caminho)), '.cache_csv')
+    parametros = json.dumps({'esquema': esquema, 'kwargs': kwargs}, sort_keys=True, default=str)
+    # o prefixo identifica o CSV (nome e caminho) e as opções de leitura; a chave, o conteúdo
+    origem = hashlib.blake2b((os.path.abspath(caminho) + parametros).encode(), digest_size=6).hexdigest()
+    prefixo = f"{os.path.splitext(os.path.basename(caminho))[0]}-{origem}-"
+    chave = hashlib.blake2b(_assinatura_arquivo(caminho, verificacao).encode(), digest_size=12).hexdigest()
+    arquivo_cache = os.path.join(diretorio_cache, f"{prefixo}{chave}.feather")
+
+    if os.path.exists(arquivo_cache):
+        # split_blocks evita consolidar as colunas em blocos (o que copiaria tudo)
+        return feather.read_table(arquivo_cache, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+    df = _ler_csv(caminho, esquema, **kwargs)
+    os.makedirs(diretorio_cache, exist_ok=True)
+    # sem compressão e em um único bloco por coluna para que o arquivo possa ser
+    # mapeado em memória sem cópia; o índice (ex.: index_col=...) é gravado nos
+    # metadados do pandas e restaurado na leitura
+    temporario = arquivo_cache + '.tmp'
+    feather.write_feather(df, temporario, compression='uncompressed', chunksize=max(len(df), 1))
+    os.replace(temporario, arquivo_cache)
+    # o conteúdo mudou: as versões anteriores deste CSV com as mesmas opções não servem mais
+    for entrada in os.scandir(diretorio_cache):
+        if entrada.name.startswith(prefixo) and entrada.name.endswith('.feather') \
+                and entrada.path != arquivo_cache:
+            os.remove(entrada.path)
+    return df
@@ -0,0 +1,225 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class _Estado:
+    ativo = False
+    memoria = False
+    inicio = None
+    # só para o tracemalloc que a própria instrumentação ligou
+    iniciou_tracemalloc = False
+
+
+_estado = _Estado()
+_local = threading.local()
+_registros = []
+
+
+class _Nulo:
+    """Etapa usada quando a instrumentação está desligada: não mede nada."""
+    __slots__ = ('linhas',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _Nulo()
+
+
+class _Etapa:
+    __slots__ = ('nome', 'linhas', 'caminho', 'mem_inicio', 'pico', 'wall', 'cpu')
+
+    def __init__(self, nome, linhas):
+        self.nome = nome
+        self.linhas = linhas
+
+    def __enter__(self):
+        pilha = _pilha()
+        self.caminho = (pilha[-1].caminho + ';' if pilha else '') + self.nome
+        if _estado.memoria:
+            atual, pico = tracemalloc.get_traced_memory()
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, pico)
+            tracemalloc.reset_peak()
+            self.mem_inicio, self.pico = atual, atual
+        pilha.append(self)
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        pilha = _pilha()
+        pilha.pop()
+        pico = None
+        if _estado.memoria:
+            # reset_peak zera o pico global, então o pico de cada etapa é
+            # repassado à etapa de fora ao terminar
+            pico_absoluto = max(self.pico, tracemalloc.get_traced_memory()[1])
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, pico_absoluto)
+            tracemalloc.reset_peak()
+            pico = pico_absoluto - self.mem_inicio
+        _registros.append((self.caminho, wall, cpu, pico, self.linhas))
+        return False
+
+
+def _pilha():
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+def ativar(memoria=False):
+    """
+    Liga a instrumentação e descarta as medições anteriores.
+    - memoria: também mede o pico de alocação de cada etapa (tracemalloc);
+      deixa o código medido bem mais lento, então use só quando precisar
+    """
+    limpar()
+    _estado.memoria = memoria
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _estado.iniciou_tracemalloc = True
+    _estado.ativo = True
+    _estado.inicio = time.time()
+
+
+def desativar():
+    """Desliga a instrumentação, mantendo as medições para o relatório."""
+    _estado.ativo = False
+    if _estado.iniciou_tracemalloc:
+        tracemalloc.stop()
+        _estado.iniciou_tracemalloc = False
+
+
+def limpar():
+    _registros.clear()
+
+
+def etapa(nome, linhas=None):
+    """
+    Context manager que mede uma etapa: tempo de relógio, tempo de CPU, pico de
+    alocação (com `ativar(memoria=True)`) e número de linhas processadas.
+    O número de linhas pode ser informado na entrada ou depois, em `registro.linhas`:
+
+        with etapa('geracao_sessoes') as registro:
+            ...
+            registro.linhas = len(sessions)
+
+    Com a instrumentação desligada, retorna um objeto vazio e nada é medido.
+    Etapas aninhadas aparecem como filhas no relatório.
+    """
+    if not _estado.ativo:
+        return _NULO
+    return _Etapa(nome, linhas)
+
+
+def medir(nome=None, linhas=None):
+    """
+    Decorador equivalente a `etapa` para uma função inteira.
+    - nome: nome da etapa (padrão: nome qualificado da função)
+    - linhas: função que recebe (resultado, *args, **kwargs) e retorna o número
+      de linhas; por padrão usa len(resultado) quando o resultado tem tamanho
+    Com a instrumentação desligada, o custo é uma única verificação por chamada.
+    """
+    def decorador(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _estado.ativo:
+                return funcao(*args, **kwargs)
+            with _Etapa(rotulo, None) as registro:
+                resultado = funcao(*args, **kwargs)
+                if linhas is not None:
+                    registro.linhas = linhas(resultado, *args, **kwargs)
+                elif hasattr(resultado, '__len__'):
+                    registro.linhas = len(resultado)
+            return resultado
+        return medida
+    return decorador
+
+
+def medir_metodos(linhas=None):
+    """
+    Decorador de classe: aplica `medir` a todos os métodos públicos definidos
+    na classe (métodos estáticos e privados ficam de fora).
+    - linhas: como em `medir`
+    """
+    def decorador(classe):
+        for atributo, valor in list(vars(classe).items()):
+            if not atributo.startswith('_') and callable(valor) and not isinstance(valor, (staticmethod, classmethod)):
+                setattr(classe, atributo, medir(f"{classe.__name__}.{atributo}", linhas)(valor))
+        return classe
+    return decorador
+
+
+def relatorio():
+    """
+    Consolida as medições por etapa (caminho completo, no formato 'pai;filha').
+    Retorna um dicionário com, para cada etapa: chamadas, tempo de relógio total
+    e próprio (sem as filhas), tempo de CPU, maior pico de alocação e linhas.
+    """
+    agregado = defaultdict(lambda: {'chamadas': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                    'pico_bytes': None, 'linhas': None})
+    for caminho, wall, cpu, pico, linhas in list(_registros):
+        item = agregado[caminho]
+        item['chamadas'] += 1
+        item['wall_s'] += wall
+        item['cpu_s'] += cpu
+        if pico is not None:
+            item['pico_bytes'] = max(item['pico_bytes'] or 0, pico)
+        if linhas is not None:
+            item['linhas'] = (item['linhas'] or 0) + int(linhas)
+
+    filhas = defaultdict(float)
+    for caminho, item in agregado.items():
+        if ';' in caminho:
+            filhas[caminho.rsplit(';', 1)[0]] += item['wall_s']
+
+    etapas = []
+    for caminho, item in agregado.items():
+        item['proprio_s'] = max(item['wall_s'] - filhas[caminho], 0.0)
+        if item['linhas'] and item['wall_s'] > 0:
+            item['linhas_por_s'] = item['linhas'] / item['wall_s']
+        etapas.append({'etapa': caminho, **item})
+    etapas.sort(key=lambda item: item['etapa'])
+    return {
+        'inicio': _estado.inicio,
+        'pid': os.getpid(),
+        'memoria': _estado.memoria,
+        'etapas': etapas,
+    }
+
+
+def salvar_relatorio(caminho, flamegraph=None):
+    """
+    Grava o relatório em JSON.
+    - flamegraph: caminho opcional de um arquivo de pilhas "dobradas"
+      ('pai;filha microssegundos' por linha), lido por flamegraph.pl ou speedscope
+    Retorna o relatório.
+    """
+    dados = relatorio()
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    if flamegraph:
+        with open(flamegraph, 'w', encoding='utf-8') as f:
+            for item in dados['etapas']:
+                f.write(f"{item['etapa']} {int(round(item['proprio_s'] * 1e6))}\n")
+    return dados
+
+
+if os.environ.get('INSTRUMENTACAO'):
+    # permite ligar a medição em scripts e processos filhos sem alterar o código
+    ativar(memoria=os.environ['INSTRUMENTACAO'] == 'memoria')
@@ -0,0 +1,389 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+
+def _como_matriz(matriz):
+    """
+    Normaliza a entrada para (P, estados), onde P é um ndarray denso ou uma
+    csr_matrix quadrada e estocástica por linha.
+    - DataFrames (como os de `criar_matriz_de_markov`) são reindexados pela
+      união de linhas e colunas, já que o crosstab pode não ser quadrado.
+    - Estados sem transições de saída viram absorventes (laço em si mesmo).
+    - O par (matriz, estados) de `MarkovOrdemK.matriz_transicao` mantém os rótulos.
+    P é sempre uma cópia: a entrada não é alterada.
+    """
+    rotulos = None
+    if isinstance(matriz, tuple) and len(matriz) == 2:
+        matriz, rotulos = matriz
+    if isinstance(matriz, pd.DataFrame):
+        estados = matriz.index.union(matriz.columns)
+        # np.array copia: com copy-on-write, to_numpy pode devolver um array somente leitura
+        P = np.array(matriz.reindex(index=estados, columns=estados, fill_value=0).fillna(0), dtype=float)
+    elif sparse.issparse(matriz):
+        P = sparse.csr_matrix(matriz, dtype=float)
+        estados = pd.RangeIndex(P.shape[0])
+    else:
+        P = np.array(matriz, dtype=float)
+        estados = pd.RangeIndex(P.shape[0])
+    if rotulos is not None:
+        if len(rotulos) != P.shape[0]:
+            raise ValueError(f"{len(rotulos)} rótulos para uma matriz {P.shape}.")
+        estados = pd.Index(rotulos)
+
+    if P.shape[0] != P.shape[1]:
+        raise ValueError(f"A matriz de transição deve ser quadrada, recebida {P.shape}.")
+
+    somas = np.asarray(P.sum(axis=1)).ravel()
+    vazias = somas == 0
+    if sparse.issparse(P):
+        if vazias.any():
+            P = (P + sparse.diags(vazias.astype(float))).tocsr()
+            somas = np.where(vazias, 1.0, somas)
+        P = sparse.diags(1 / somas) @ P
+        return P.tocsr(), estados
+
+    if vazias.any():
+        P[vazias, vazias] = 1.0
+        somas = np.where(vazias, 1.0, somas)
+    return P / somas[:, None], estados
+
+
+def distribuicao_estacionaria(matriz, metodo='autovalor', tol=1e-12, max_iter=10_000):
+    """
+    Calcula a distribuição estacionária pi (pi = pi P) da cadeia.
+    - matriz: DataFrame, ndarray, matriz esparsa de transição ou o par
+      (matriz, estados) de `MarkovOrdemK.matriz_transicao`
+    - metodo: 'autovalor' (autovetor do autovalor 1) ou 'potencia' (iteração da potência)
+    - tol, max_iter: critério de parada da iteração da potência
+    Retorna uma Series indexada pelos estados.
+    """
+    P, estados = _como_matriz(matriz)
+    n = P.shape[0]
+
+    if metodo == 'autovalor':
+        if sparse.issparse(P) and n > 2:
+            _, vetores = sparse_linalg.eigs(P.T, k=1, sigma=1.0 + 1e-9)
+            pi = np.real(vetores[:, 0])
+        else:
+            P_denso = P.toarray() if sparse.issparse(P) else P
+            valores, vetores = np.linalg.eig(P_denso.T)
+            pi = np.real(vetores[:, np.argmin(np.abs(valores - 1))])
+    elif metodo == 'potencia':
+        pi = np.full(n, 1 / n)
+        for _ in range(max_iter):
+            proximo = P.T @ pi
+            if np.abs(proximo - pi).sum() < tol:
+                pi = proximo
+                break
+            pi = proximo
+    else:
+        raise ValueError("metodo deve ser 'autovalor' ou 'potencia'.")
+
+    pi = np.abs(pi)
+    return pd.Series(pi / pi.sum(), index=estados, name='pi')
+
+
+def probabilidades_n_passos(matriz, n):
+    """
+    Calcula P^n (probabilidades de transição em n passos) por quadrados repetidos,
+    com O(log n) multiplicações de matrizes.
+    Retorna um DataFrame para entradas densas e uma csr_matrix para entradas esparsas.
+    """
+    if n < 0:
+        raise ValueError("n deve ser não negativo.")
+    P, estados = _como_matriz(matriz)
+    esparsa = sparse.issparse(P)
+
+    resultado = sparse.identity(P.shape[0], format='csr') if esparsa else np.eye(P.shape[0])
+    base = P
+    while n:
+        if n & 1:
+            resultado = resultado @ base
+        n >>= 1
+        if n:
+            base = base @ base
+
+    if esparsa:
+        return sparse.csr_matrix(resultado)
+    return pd.DataFrame(resultado, index=estados, columns=estados)
+
+
+def metricas_absorcao(matriz, absorventes=None):
+    """
+    Métricas de cadeias absorventes (ex.: funil até a conversão).
+    - absorventes: lista de estados absorventes; se None, usa os estados com P[i, i] == 1
+    Retorna um dicionário com:
+     - matriz_fundamental: N = (I - Q)^-1, visitas esperadas entre estados transientes
+       (None para entradas esparsas, onde N costuma ser densa demais)
+     - passos_esperados: número esperado de passos até a absorção, por estado inicial
+     - probabilidade_absorcao: B = N R, probabilidade de terminar em cada absorvente
+    """
+    P, estados = _como_matriz(matriz)
+    esparsa = sparse.issparse(P)
+
+    if absorventes is None:
+        mascara = np.isclose(P.diagonal(), 1.0)
+    else:
+        mascara = estados.isin(absorventes)
+    if not mascara.any():
+        raise ValueError("A cadeia não possui estados absorventes.")
+
+    transientes = np.flatnonzero(~mascara)
+    absorv = np.flatnonzero(mascara)
+    Q = P[transientes][:, transientes]
+    R = P[transientes][:, absorv]
+    identidade = sparse.identity(len(transientes), format='csc') if esparsa else np.eye(len(transientes))
+    A = identidade - Q
+
+    if esparsa:
+        lu = sparse_linalg.splu(sparse.csc_matrix(A))
+        N = None
+        passos = lu.solve(np.ones(len(transientes)))
+        B = lu.solve(R.toarray())
+    else:
+        N = np.linalg.solve(A, identidade)
+        passos = N.sum(axis=1)
+        B = N @ R
+
+    idx_t, idx_a = estados[transientes], estados[absorv]
+    return {
+        "matriz_fundamental": None if N is None else pd.DataFrame(N, index=idx_t, columns=idx_t),
+        "passos_esperados": pd.Series(passos, index=idx_t, name='passos_esperados'),
+        "probabilidade_absorcao": pd.DataFrame(B, index=idx_t, columns=idx_a),
+    }
+
+
+def _tabela_cumulativa(P):
+    """
+    Monta a tabela de busca usada pelo simulador: para cada linha i, as
+    probabilidades acumuladas deslocadas por i, concatenadas em um único vetor
+    crescente. Assim, um np.searchsorted(tabela, estado + u) sorteia o próximo
+    estado de todos os caminhantes de uma vez.
+    """
+    P = sparse.csr_matrix(P)
+    P.eliminate_zeros()
+    P.sort_indices()
+    acumulado = np.cumsum(P.data)
+    inicio_linha = np.concatenate(([0.0], acumulado))[P.indptr[:-1]]
+    linha = np.repeat(np.arange(P.shape[0]), np.diff(P.indptr))
+    acumulado = acumulado - inicio_linha[linha]
+    fim_linha = P.indptr[1:] - 1
+    acumulado /= acumulado[fim_linha][linha]
+    acumulado[fim_linha] = 1.0  # elimina erro de arredondamento no fim da linha
+    return acumulado + linha, P.indptr, P.indices
+
+
+def _sortear(tabela, indptr, indices, estados_atuais, u):
+    posicao = np.searchsorted(tabela, estados_atuais + u, side='right')
+    posicao = np.clip(posicao, indptr[estados_atuais], indptr[estados_atuais + 1] - 1)
+    return indices[posicao]
+
+
+def simular_caminhantes(matriz, n_caminhantes, n_passos, inicio=None, seed=None,
+                        retornar_trajetorias=False):
+    """
+    Simula muitos caminhantes avançando juntos na cadeia, sem laços em Python
+    por caminhante (busca vetorizada nas linhas acumuladas da matriz).
+    - n_caminhantes: quantidade de caminhantes simultâneos
+    - n_passos: número de transições simuladas
+    - inicio: None (estado inicial uniforme), um estado, ou uma distribuição
+      (Series/array) sobre os estados
+    - seed: semente do gerador aleatório
+    - retornar_trajetorias: se True, retorna também a matriz (n_passos + 1, n_caminhantes)
+      com os códigos dos estados visitados
+    Retorna um DataFrame com a fração de caminhantes em cada estado por passo
+    (e as trajetórias, se solicitado).
+    """
+    P, estados = _como_matriz(matriz)
+    n = P.shape[0]
+    rng = np.random.default_rng(seed)
+    tabela, indptr, indices = _tabela_cumulativa(P)
+    dtype = np.min_scalar_type(n - 1)
+
+    if inicio is None:
+        atual = rng.integers(0, n, size=n_caminhantes)
+    elif np.ndim(inicio) == 0:
+        atual = np.full(n_caminhantes, estados.get_loc(inicio))
+    else:
+        dist = pd.Series(inicio).reindex(estados, fill_value=0) if isinstance(inicio, pd.Series) else inicio
+        tabela_ini, indptr_ini, indices_ini = _tabela_cumulativa(np.asarray(dist, dtype=float)[None, :])
+        zeros = np.zeros(n_caminhantes, dtype=np.intp)
+        atual = _sortear(tabela_ini, indptr_ini, indices_ini, zeros, rng.random(n_caminhantes))
+    atual = atual.astype(np.intp)
+
+    ocupacao = np.empty((n_passos + 1, n))
+    ocupacao[0] = np.bincount(atual, minlength=n)
+    trajetorias = np.empty((n_passos + 1, n_caminhantes), dtype=dtype) if retornar_trajetorias else None
+    if retornar_trajetorias:
+        trajetorias[0] = atual
+
+    for passo in range(1, n_passos + 1):
+        atual = _sortear(tabela, indptr, indices, atual, rng.random(n_caminhantes))
+        ocupacao[passo] = np.bincount(atual, minlength=n)
+        if retornar_trajetorias:
+            trajetorias[passo] = atual
+
+    ocupacao = pd.DataFrame(ocupacao / n_caminhantes, columns=estados)
+    ocupacao.index.name = 'passo'
+    if retornar_trajetorias:
+        return ocupacao, trajetorias
+    return ocupacao
+
+
+class MarkovOrdemK:
+    """
+    Cadeia de Markov de ordem k (ou de ordem variável, com backoff).
+
+    Cada contexto (os k estados anteriores) é convertido em uma chave inteira
+    compacta por codificação em base n (n = número de estados), e apenas as
+    combinações contexto -> próximo estado observadas são armazenadas, em
+    vetores ordenados. O ajuste é uma única passada vetorizada sobre a sequência.
+    """
+
+    def __init__(self, ordem=2, ordem_variavel=True, min_contagem=1, alfa=0.0):
+        """
+        Parameters:
+        - ordem: ordem máxima k da cadeia.
+        - ordem_variavel: se True, contextos de ordem k não vistos (ou com menos de
+          `min_contagem` ocorrências) recuam para ordens menores, até a frequência
+          marginal (ordem 0). Se False, usa apenas a ordem k.
+        - min_contagem: ocorrências mínimas para um contexto ser usado.
+        - alfa: suavização aditiva das probabilidades de transição.
+        """
+        if ordem < 1:
+            raise ValueError("ordem deve ser >= 1.")
+        self.ordem = ordem
+        self.ordem_variavel = ordem_variavel
+        self.min_contagem = min_contagem
+        self.alfa = alfa
+
+    def _contextos(self, codigos, j, inicio):
+        """Chaves dos contextos de ordem j que precedem as posições inicio..fim."""
+        n, fim = len(self.estados), len(codigos)
+        chave = np.zeros(fim - inicio, dtype=np.int64)
+        invalido = np.zeros(fim - inicio, dtype=bool)
+        for i in range(j, 0, -1):
+            anterior = codigos[inicio - i:fim - i]
+            chave = chave * n + anterior
+            invalido |= anterior < 0
+        chave[invalido] = -1
+        return chave
+
+    def ajustar(self, sequencia):
+        """
+        Ajusta as contagens de todas as ordens de 0 a k.
+        - sequencia: Series, lista ou array com os estados em ordem temporal
+          (ex.: df[coluna_estado]). Valores nulos são descartados.
+        Retorna o próprio modelo.
+        """
+        sequencia = pd.Series(sequencia).dropna()
+        codigos, self.estados = pd.factorize(sequencia, sort=True)
+        n = len(self.estados)
+        if n ** (self.ordem + 1) >= 2 ** 63:
+            raise ValueError(f"{n} estados com ordem {self.ordem} excedem chaves de 64 bits.")
+        codigos = codigos.astype(np.min_scalar_type(-n))
+
+        self._tabelas = {0: (np.arange(n, dtype=np.int64), np.bincount(codigos, minlength=n))}
+        for j in range(1, self.ordem + 1):
+            if len(codigos) <= j:
+                break
+            chaves = self._contextos(codigos, j, j) * n + codigos[j:]
+            if n ** (j + 1) <= 2 ** 24:
+                contagens = np.bincount(chaves, minlength=n ** (j + 1))
+                chaves = np.flatnonzero(contagens)
+                contagens = contagens[chaves]
+            else:
+                chaves, contagens = np.unique(chaves, return_counts=True)
+            self._tabelas[j] = (chaves, contagens)
+
+        self._totais = {}
+        for j, (chaves, contagens) in self._tabelas.items():
+            contextos, inicio = np.unique(chaves // n, return_index=True)
+            self._totais[j] = (contextos, np.add.reduceat(contagens, inicio))
+        return self
+
+    def _buscar(self, ordenado, valores):
+        posicao = np.clip(np.searchsorted(ordenado, valores), 0, len(ordenado) - 1)
+        return posicao, ordenado[posicao] == valores
+
+    def _codificar(self, sequencia):
+        return self.estados.get_indexer(pd.Series(sequencia).dropna())
+
+    def probabilidades(self, contexto):
+        """
+        Distribuição do próximo estado dado o histórico recente.
+        - contexto: lista com os últimos estados observados (o último é o mais recente);
+          com ordem_variavel=False, precisa de pelo menos `ordem` estados
+        Retorna uma Series indexada pelos estados.
+        """
+        n = len(self.estados)
+        codigos = self._codificar(list(contexto)[-self.ordem:] + [self.estados[0]])
+        if not self.ordem_variavel and len(codigos) - 1 < self.ordem:
+            raise ValueError(f"Com ordem_variavel=False o contexto precisa de {self.ordem} estados "
+                             f"não nulos; recebeu {len(codigos) - 1}.")
+        ordens = range(min(self.ordem, len(codigos) - 1), -1, -1) if self.ordem_variavel else [self.ordem]
+        for j in ordens:
+            if j not in self._tabelas:
+                continue
+            ctx = self._contextos(codigos, j, len(codigos) - 1)[0] if j else 0
+            contextos, totais = self._totais[j]
+            pos, achou = self._buscar(contextos, np.array([ctx]))
+            if ctx < 0 or not achou[0] or totais[pos[0]] < self.min_contagem:
+                continue
+            chaves, contagens = self._tabelas[j]
+            inicio, fim = np.searchsorted(chaves, [ctx * n, ctx * n + n])
+            contagem = np.zeros(n)
+            contagem[chaves[inicio:fim] - ctx * n] = contagens[inicio:fim]
+            p = (contagem + self.alfa) / (totais[pos[0]] + self.alfa * n)
+            return pd.Series(p, index=self.estados, name=j)
+        raise KeyError(f"Contexto não observado: {list(contexto)}")
+
+    def log_verossimilhanca(self, sequencia):
+        """
+        Log-verossimilhança de uma sequência sob o modelo, calculada de forma
+        vetorizada para todas as posições (com backoff por posição).
+        Útil para comparar ordens diferentes em dados de validação.
+        """
+        n = len(self.estados)
+        codigos = self._codificar(sequencia)
+        resultado = np.full(len(codigos) - self.ordem, np.nan)
+        proximos = codigos[self.ordem:]
+        ordens = range(self.ordem, -1, -1) if self.ordem_variavel else [self.ordem]
+        for j in ordens:
+            pendentes = np.isnan(resultado)
+            if j not in self._tabelas or not pendentes.any():
+                continue
+            ctx = self._contextos(codigos, j, self.ordem) if j else np.zeros(len(resultado), dtype=np.int64)
+            contextos, totais = self._totais[j]
+            pos, achou = self._buscar(contextos, ctx)
+            usar = pendentes & achou & (ctx >= 0) & (totais[pos] >= self.min_contagem)
+            chaves, contagens = self._tabelas[j]
+            pos_chave, achou_chave = self._buscar(chaves, ctx * n + proximos)
+            contagem = np.where(achou_chave & (proximos >= 0), contagens[pos_chave], 0)
+            p = (contagem + self.alfa) / (totais[pos] + self.alfa * n)
+            resultado[usar] = p[usar]
+        with np.errstate(divide='ignore'):
+            return np.log(np.nan_to_num(resultado, nan=0.0)).sum()
+
+    def matriz_transicao(self):
+        """
+        Matriz de transição da cadeia expandida, cujos estados são as tuplas de k
+        estados consecutivos: o contexto (a, b) vai para (b, c) com P(c | a, b).
+        Retorna (matriz esparsa, Index de tuplas). O par pode ser passado inteiro a
+        `distribuicao_estacionaria`, `metricas_absorcao`, `probabilidades_n_passos` e
+        `simular_caminhantes`, que então rotulam o resultado com as tuplas.
+        Para ordem 1, equivale à matriz de `criar_matriz_de_markov`.
+        """
+        n, k = len(self.estados), self.ordem
+        chaves, contagens = self._tabelas[k]
+        origem = chaves // n
+        destino = chaves % (n ** k)
+        contextos, inverso = np.unique(np.concatenate([origem, destino]), return_inverse=True)
+        linhas, colunas = inverso[:len(chaves)], inverso[len(chaves):]
+        P = sparse.csr_matrix((contagens.astype(float), (linhas, colunas)),
+                              shape=(len(contextos), len(contextos)))
+        digitos = (contextos[:, None] // n ** np.arange(k - 1, -1, -1)) % n
+        rotulos = pd.Index([tuple(self.estados[d]) for d in digitos])
+        return _como_matriz(P)[0], rotulos
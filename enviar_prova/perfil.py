@@ -0,0 +1,252 @@
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+
+def _nova_figura(figsize, salvar_em, linhas=1, colunas=1):
+    """
+    Cria a figura fora do pyplot (apenas Agg) quando o destino é um arquivo,
+    para que nenhuma figura fique acumulada na sessão.
+    """
+    if salvar_em:
+        fig = Figure(figsize=figsize)
+        return fig, fig.subplots(linhas, colunas, squeeze=False)
+    return plt.subplots(linhas, colunas, figsize=figsize, squeeze=False)
+
+
+def _finalizar_figura(fig, salvar_em, nome_arquivo):
+    fig.tight_layout()
+    if salvar_em:
+        fig.savefig(os.path.join(salvar_em, nome_arquivo))
+    else:
+        plt.show()
+        plt.close(fig)
+
+
+def _nome_arquivo(texto):
+    """Troca por '_' os caracteres do nome da coluna que não cabem em um nome de arquivo."""
+    return re.sub(r'[^\w.-]+', '_', str(texto)).strip('.') or '_'
+
+
+def _resumo_coluna(valores, bins, fator_kde):
+    """
+    Calcula, em uma passada sobre os valores finitos de uma coluna, tudo o que
+    os gráficos precisam: estatísticas descritivas, histograma, KDE aproximada a
+    partir de um histograma fino e as estatísticas do boxplot.
+    """
+    # inf estragaria os quantis e o intervalo do histograma
+    valores = valores[np.isfinite(valores)]
+    n = len(valores)
+    if n == 0:
+        return None
+
+    q0, q1, q2, q3, q4 = np.quantile(valores, [0, 0.25, 0.5, 0.75, 1])
+    media, desvio = valores.mean(), valores.std(ddof=1) if n > 1 else 0.0
+    iqr = q3 - q1
+    dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+    fora = valores[(valores < q1 - 1.5 * iqr) | (valores > q3 + 1.5 * iqr)]
+
+    limites = (q0, q4) if q4 > q0 else (q0 - 0.5, q4 + 0.5)
+    finos, bordas_finas = np.histogram(valores, bins=bins * fator_kde, range=limites)
+    contagens = finos.reshape(bins, fator_kde).sum(axis=1)
+    bordas = bordas_finas[::fator_kde]
+
+    # KDE gaussiana (regra de Silverman) por convolução do histograma fino
+    largura_fina = bordas_finas[1] - bordas_finas[0]
+    h = 1.06 * desvio * n ** (-1 / 5) if desvio > 0 else largura_fina
+    raio = max(1, int(math.ceil(3 * h / largura_fina)))
+    nucleo = np.exp(-0.5 * (np.arange(-raio, raio + 1) * largura_fina / h) ** 2)
+    # 'full' recortado no centro: com poucos valores o núcleo pode ser maior que a grade,
+    # e 'same' devolveria o tamanho do núcleo
+    kde = np.convolve(finos, nucleo / nucleo.sum(), mode='full')[raio:raio + len(finos)] * fator_kde
+    centros_kde = (bordas_finas[:-1] + bordas_finas[1:]) / 2
+
+    # até 100 outliers espaçados na ordem (incluindo os extremos) bastam para o gráfico
+    if len(fora) > 100:
+        fora = np.sort(fora)[np.linspace(0, len(fora) - 1, 100).astype(int)]
+    return {
+        'estatisticas': {'count': n, 'mean': media, 'std': desvio, 'min': q0,
+                         '25%': q1, '50%': q2, '75%': q3, 'max': q4},
+        'hist': (contagens, bordas),
+        'kde': (centros_kde, kde),
+        'box': {'med': q2, 'q1': q1, 'q3': q3,
+                'whislo': dentro.min() if len(dentro) else q1,
+                'whishi': dentro.max() if len(dentro) else q3,
+                'fliers': fora},
+    }
+
+
+def perfil_numerico(df, colunas_por_figura=12, bins=30, fator_kde=8, salvar_em=None, formato='png'):
+    """
+    Versão em lote de `estatistica_descritiva_numerica` para DataFrames largos.
+    Os histogramas, a KDE (aproximada sobre um histograma fino, custo linear) e
+    as estatísticas do boxplot são pré-calculados, e os gráficos são agrupados
+    em poucas figuras em grade.
+    - colunas_por_figura: quantas colunas numéricas (par histograma + boxplot) por figura
+    - bins: número de bins dos histogramas
+    - fator_kde: subdivisões de cada bin usadas para estimar a KDE
+    - salvar_em: diretório de saída. Se informado, as figuras são renderizadas
+      com o backend Agg direto para arquivos, sem passar pelo pyplot.
+    - formato: extensão dos arquivos salvos ('png', 'svg', ...)
+    Retorna um DataFrame com as estatísticas descritivas (mesmo formato do describe().T).
+    """
+    num_cols = df.select_dtypes(include=np.number).columns
+    resumos = {}
+    for col in num_cols:
+        resumo = _resumo_coluna(df[col].to_numpy(dtype=float, na_value=np.nan), bins, fator_kde)
+        if resumo is not None:
+            resumos[col] = resumo
+
+    stats = pd.DataFrame({col: r['estatisticas'] for col, r in resumos.items()}).T
+    if salvar_em:
+        os.makedirs(salvar_em, exist_ok=True)
+
+    colunas = list(resumos)
+    for n_fig, inicio in enumerate(range(0, len(colunas), colunas_por_figura)):
+        grupo = colunas[inicio:inicio + colunas_por_figura]
+        linhas = math.ceil(len(grupo) / 2)
+        figsize = (16, 2.8 * linhas)
+        fig, axes = _nova_figura(figsize, salvar_em, linhas, 4)
+
+        for ax in axes.flat[2 * len(grupo):]:
+            ax.set_visible(False)
+        for k, col in enumerate(grupo):
+            resumo = resumos[col]
+            ax_hist, ax_box = axes.flat[2 * k], axes.flat[2 * k + 1]
+            contagens, bordas = resumo['hist']
+            ax_hist.stairs(contagens, bordas, fill=True, color='skyblue')
+            ax_hist.plot(*resumo['kde'], color='steelblue', linewidth=1)
+            ax_hist.set_title(f'Histograma de {col}', fontsize=9)
+            ax_box.bxp([resumo['box']], orientation='horizontal', widths=0.6, patch_artist=True,
+                       boxprops={'facecolor': 'lightgreen'})
+            ax_box.set_yticks([])
+            ax_box.set_title(f'Boxplot de {col}', fontsize=9)
+
+        _finalizar_figura(fig, salvar_em, f'numericas_{n_fig + 1:02d}.{formato}')
+
+    return stats
+
+
+def _hyperloglog(registros, valores_unicos, p):
+    """Atualiza os registradores do HyperLogLog com os hashes dos valores."""
+    h = pd.util.hash_array(np.asarray(valores_unicos, dtype=object))
+    indice = (h >> np.uint64(64 - p)).astype(np.intp)
+    resto = h & np.uint64((1 << (64 - p)) - 1)
+    _, expoente = np.frexp(resto.astype(np.float64))
+    rho = (64 - p) - expoente + 1
+    np.maximum.at(registros, indice, rho.astype(np.uint8))
+
+
+def _estimar_distintos(registros):
+    m = len(registros)
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.sum(2.0 ** -registros.astype(float))
+    vazios = np.count_nonzero(registros == 0)
+    if estimativa <= 2.5 * m and vazios:
+        estimativa = m * math.log(m / vazios)
+    return int(round(estimativa))
+
+
+def _contar_categorica(serie, limite_cardinalidade, top_k, tamanho_bloco, precisao_hll=14):
+    """
+    Conta os valores de uma coluna uma única vez, bloco a bloco.
+    Enquanto o número de distintos fica abaixo do limite, as contagens são exatas.
+    Acima dele, a coluna passa a ser tratada como de alta cardinalidade: os
+    distintos são estimados por HyperLogLog e apenas os candidatos mais
+    frequentes (heavy hitters) são mantidos, com contagens que podem estar
+    subestimadas em até `erro_maximo`.
+    """
+    registros = np.zeros(2 ** precisao_hll, dtype=np.uint8)
+    candidatos = pd.Series(dtype='int64')
+    n_candidatos = max(10 * top_k, 1000)
+    aproximado, erro_maximo, nao_nulos, blocos, distintos_bloco = False, 0, 0, 0, 0
+
+    tamanho_bloco = tamanho_bloco or max(len(serie), 1)
+    for inicio in range(0, len(serie), tamanho_bloco):
+        contagem = serie.iloc[inicio:inicio + tamanho_bloco].value_counts()
+        nao_nulos += int(contagem.sum())
+        blocos += 1
+        distintos_bloco = len(contagem)
+        _hyperloglog(registros, contagem.index, precisao_hll)
+        candidatos = candidatos.add(contagem, fill_value=0)
+        if len(candidatos) > limite_cardinalidade:
+            aproximado = True
+        if aproximado and len(candidatos) > n_candidatos:
+            candidatos = candidatos.sort_values(ascending=False)
+            # um valor descartado em vários blocos perde a contagem de cada um deles
+            erro_maximo += int(candidatos.iloc[n_candidatos])
+            candidatos = candidatos.iloc[:n_candidatos]
+
+    if not aproximado:
+        distintos = len(candidatos)
+    elif blocos == 1:
+        distintos = distintos_bloco  # a coluna coube em um bloco: contagem exata
+    else:
+        distintos = _estimar_distintos(registros)
+    return {
+        'contagens': candidatos.astype('int64').sort_values(ascending=False),
+        'nao_nulos': nao_nulos,
+        'nulos': len(serie) - nao_nulos,
+        'distintos': distintos,
+        'aproximado': aproximado,
+        'erro_maximo': erro_maximo,
+    }
+
+
+def perfil_categorico(df, limite_cardinalidade=10_000, top_k=20, tamanho_bloco=1_000_000,
+                      n_jobs=1, salvar_em=None, formato='png'):
+    """
+    Versão em lote de `estatistica_descritiva_categorica` para colunas de alta
+    cardinalidade (ex.: session_id, page_url).
+    - limite_cardinalidade: acima desse número de distintos, usa contagem aproximada
+      de distintos (HyperLogLog) e top-K aproximado (heavy hitters)
+    - top_k: quantas categorias exibir; as demais viram a barra "outros"
+    - tamanho_bloco: linhas processadas por vez em cada coluna (limita a memória)
+    - n_jobs: colunas processadas em paralelo (threads)
+    - salvar_em, formato: como em `perfil_numerico`
+    Retorna (visao_geral, tabelas): um DataFrame com nulos/distintos por coluna e
+    um dicionário com a tabela de contagem e percentual de cada coluna.
+    """
+    cat_cols = df.select_dtypes(include=['object', 'category', 'string']).columns
+    contar = lambda col: _contar_categorica(df[col], limite_cardinalidade, top_k, tamanho_bloco)
+    if n_jobs > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            resultados = dict(zip(cat_cols, executor.map(contar, cat_cols)))
+    else:
+        resultados = {col: contar(col) for col in cat_cols}
+
+    if salvar_em:
+        os.makedirs(salvar_em, exist_ok=True)
+
+    tabelas = {}
+    for col, r in resultados.items():
+        topo = r['contagens'].iloc[:top_k]
+        outros = r['nao_nulos'] - int(topo.sum())
+        contagens = pd.concat([topo, pd.Series({'outros': outros})]) if outros > 0 else topo
+        tabelas[col] = pd.DataFrame({
+            'count': contagens,
+            'percent (%)': (contagens / max(r['nao_nulos'], 1) * 100).round(2),
+        })
+
+        fig, axes = _nova_figura((8, 4), salvar_em)
+        ax = axes[0, 0]
+        cores = plt.cm.Pastel1(np.arange(len(contagens)) % 9)
+        ax.bar(contagens.index.astype(str), contagens.to_numpy(), color=cores)
+        ax.set_title(f'Distribuição de {col}' + (' (aproximada)' if r['aproximado'] else ''))
+        ax.tick_params(axis='x', labelrotation=45)
+        for rotulo in ax.get_xticklabels():
+            rotulo.set_horizontalalignment('right')
+        _finalizar_figura(fig, salvar_em, f'categorica_{_nome_arquivo(col)}.{formato}')
+
+    visao_geral = pd.DataFrame({
+        col: {'nao_nulos': r['nao_nulos'], 'nulos': r['nulos'], 'distintos': r['distintos'],
+              'aproximado': r['aproximado'], 'erro_maximo': r['erro_maximo']}
+        for col, r in resultados.items()
+    }).T
+    return visao_geral, tabelas
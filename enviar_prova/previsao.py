@@ -0,0 +1,206 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .ChartGenerator import ChartGenerator
+except ImportError:  # importado como módulo de topo (enviar_prova no sys.path)
+    from ChartGenerator import ChartGenerator
+
+QUANTIS = (0.05, 0.25, 0.5, 0.75, 0.95)
+# bytes por célula (caminho x período) de um bloco: valores float32, índices
+# do bootstrap e temporários da contagem em bins
+_BYTES_POR_CELULA = 32
+
+
+def ajustar_modelo(serie, modelo='normal', tamanho_bloco=None):
+    """
+    Ajusta um modelo simples à série histórica de um KPI (em ordem temporal).
+    - modelo:
+       - 'normal': valores i.i.d. com a média e o desvio-padrão do histórico
+       - 'bootstrap': reamostragem do histórico em blocos consecutivos, que
+         preserva a autocorrelação de curto prazo
+       - 'ar1': x[t] = media + phi * (x[t-1] - media) + ruído, a partir do último valor
+    - tamanho_bloco: tamanho dos blocos do bootstrap (padrão: n ** (1/3))
+    Retorna um dicionário com o tipo do modelo e seus parâmetros.
+    """
+    valores = pd.Series(serie).dropna().to_numpy(dtype=float)
+    if len(valores) < 2:
+        raise ValueError("A série precisa de pelo menos 2 valores não nulos.")
+    media, desvio = valores.mean(), valores.std(ddof=1)
+
+    if modelo == 'normal':
+        return {'tipo': 'normal', 'media': media, 'desvio': desvio}
+    if modelo == 'bootstrap':
+        tamanho_bloco = int(tamanho_bloco or max(1, round(len(valores) ** (1 / 3))))
+        return {'tipo': 'bootstrap', 'historico': valores.astype(np.float32),
+                'tamanho_bloco': min(tamanho_bloco, len(valores))}
+    if modelo == 'ar1':
+        desvios = valores - media
+        denominador = np.dot(desvios[:-1], desvios[:-1])
+        phi = np.dot(desvios[1:], desvios[:-1]) / denominador if denominador > 0 else 0.0
+        phi = float(np.clip(phi, -0.99, 0.99))
+        residuos = desvios[1:] - phi * desvios[:-1]
+        return {'tipo': 'ar1', 'media': media, 'phi': phi,
+                'sigma': residuos.std(ddof=1) if len(residuos) > 1 else 0.0,
+                'ultimo': valores[-1]}
+    raise ValueError("modelo deve ser 'normal', 'bootstrap' ou 'ar1'.")
+
+
+def simular(modelo, horizonte=12, n_caminhos=10_000, limites=None, rng=None):
+    """
+    Simula n_caminhos trajetórias de `horizonte` períodos de um modelo ajustado
+    por `ajustar_modelo`, todas de uma vez.
+    - limites: (mínimo, máximo) para truncar os valores, ex.: (0, 100) para taxas
+    - rng: np.random.Generator (padrão: um novo, sem semente)
+    Retorna um array float32 de forma (n_caminhos, horizonte).
+    """
+    rng = rng or np.random.default_rng()
+    tipo = modelo['tipo']
+    if tipo == 'normal':
+        caminhos = rng.standard_normal((n_caminhos, horizonte), dtype=np.float32)
+        caminhos *= np.float32(modelo['desvio'])
+        caminhos += np.float32(modelo['media'])
+    elif tipo == 'bootstrap':
+        historico, bloco = modelo['historico'], modelo['tamanho_bloco']
+        n_blocos = -(-horizonte // bloco)
+        inicios = rng.integers(0, len(historico) - bloco + 1, size=(n_caminhos, n_blocos))
+        indices = (inicios[:, :, None] + np.arange(bloco)).reshape(n_caminhos, -1)[:, :horizonte]
+        caminhos = historico[indices]
+    elif tipo == 'ar1':
+        media, phi = np.float32(modelo['media']), np.float32(modelo['phi'])
+        caminhos = rng.standard_normal((n_caminhos, horizonte), dtype=np.float32)
+        caminhos *= np.float32(modelo['sigma'])
+        anterior = np.full(n_caminhos, modelo['ultimo'] - modelo['media'], dtype=np.float32)
+        for t in range(horizonte):
+            caminhos[:, t] += phi * anterior
+            anterior = caminhos[:, t]
+        caminhos += media
+    else:
+        raise ValueError(f"Modelo desconhecido: {tipo}")
+    if limites is not None:
+        np.clip(caminhos, limites[0], limites[1], out=caminhos)
+    return caminhos
+
+
+def _nome_quantil(q):
+    return f"p{q * 100:g}"
+
+
+def resumir(caminhos, quantis=QUANTIS):
+    """
+    Média, desvio-padrão e quantis de cada período de uma matriz de caminhos
+    (n_caminhos x horizonte), calculados por coluna, sem achatar a matriz.
+    Retorna um DataFrame com uma linha por período.
+    """
+    valores = np.quantile(caminhos, quantis, axis=0)
+    resumo = pd.DataFrame({
+        'periodo': np.arange(1, caminhos.shape[1] + 1),
+        'media': caminhos.mean(axis=0, dtype=np.float64),
+        'desvio': caminhos.std(axis=0, ddof=1, dtype=np.float64),
+    })
+    for q, linha in zip(quantis, valores):
+        resumo[_nome_quantil(q)] = linha
+    return resumo
+
+
+def _quantis_histograma(contagens, inicio, largura, quantis):
+    """Quantis por período a partir das contagens em bins, com interpolação linear dentro do bin."""
+    acumulado = np.cumsum(contagens, axis=1)
+    total = acumulado[:, -1:]
+    resultado = []
+    for q in quantis:
+        alvo = q * total
+        k = np.argmax(acumulado >= alvo, axis=1)
+        linhas = np.arange(len(k))
+        anterior = np.where(k > 0, acumulado[linhas, k - 1], 0)
+        fracao = (alvo[:, 0] - anterior) / np.maximum(contagens[linhas, k], 1)
+        resultado.append(inicio + (k + fracao) * largura)
+    return resultado
+
+
+def prever_kpi(serie, modelo='normal', horizonte=12, n_caminhos=100_000, quantis=QUANTIS,
+               limites=None, tamanho_bloco=None, memoria_mb=64, bins=4096, seed=None):
+    """
+    Previsão de Monte Carlo de um KPI: ajusta o modelo e simula os caminhos em
+    blocos float32 que cabem em `memoria_mb`, de modo que a memória não cresce
+    com n_caminhos.
+    - modelo, tamanho_bloco: como em `ajustar_modelo`
+    - limites: como em `simular`
+    - bins: resolução da contagem usada para os quantis quando há mais de um bloco.
+      Os limites dos bins vêm do primeiro bloco (com folga), e os quantis são
+      interpolados dentro do bin; média e desvio são exatos.
+    Com um único bloco, os quantis são exatos (np.quantile por período).
+    Retorna um DataFrame com período, média, desvio e uma coluna por quantil (p5, p50, ...).
+    """
+    ajustado = ajustar_modelo(serie, modelo, tamanho_bloco)
+    rng = np.random.default_rng(seed)
+    lote = max(1, min(n_caminhos, int(memoria_mb * 2**20 // (horizonte * _BYTES_POR_CELULA))))
+    if n_caminhos <= lote:
+        return resumir(simular(ajustado, horizonte, n_caminhos, limites, rng), quantis)
+
+    soma = np.zeros(horizonte)
+    soma_quadrados = np.zeros(horizonte)
+    contagens = None
+    deslocamento = np.arange(horizonte) * bins
+    restantes = n_caminhos
+    while restantes > 0:
+        bloco = simular(ajustado, horizonte, min(lote, restantes), limites, rng)
+        restantes -= len(bloco)
+        soma += bloco.sum(axis=0, dtype=np.float64)
+        soma_quadrados += np.einsum('ij,ij->j', bloco, bloco, dtype=np.float64)
+        if contagens is None:
+            minimo, maximo = bloco.min(axis=0).astype(float), bloco.max(axis=0).astype(float)
+            folga = np.maximum((maximo - minimo) * 0.25, np.abs(maximo) * 1e-6 + 1e-9)
+            inicio, fim = minimo - folga, maximo + folga
+            if limites is not None:
+                inicio, fim = np.maximum(inicio, limites[0]), np.minimum(fim, limites[1])
+                fim = np.maximum(fim, inicio + 1e-9)
+            largura = (fim - inicio) / bins
+            contagens = np.zeros((horizonte, bins), dtype=np.int64)
+        celulas = ((bloco - inicio.astype(np.float32)) / largura.astype(np.float32)).astype(np.int64)
+        np.clip(celulas, 0, bins - 1, out=celulas)
+        celulas += deslocamento
+        contagens += np.bincount(celulas.ravel(), minlength=horizonte * bins).reshape(horizonte, bins)
+
+    media = soma / n_caminhos
+    resumo = pd.DataFrame({
+        'periodo': np.arange(1, horizonte + 1),
+        'media': media,
+        'desvio': np.sqrt(np.maximum(soma_quadrados - n_caminhos * media ** 2, 0) / (n_caminhos - 1)),
+    })
+    for q, linha in zip(quantis, _quantis_histograma(contagens, inicio, largura, quantis)):
+        resumo[_nome_quantil(q)] = linha
+    return resumo
+
+
+def prever_kpis(df, colunas=None, **kwargs):
+    """
+    Aplica `prever_kpi` a várias colunas (padrão: todas as numéricas), uma de
+    cada vez, então a memória usada é a de uma única previsão.
+    Os kwargs são repassados a `prever_kpi` (modelo, horizonte, n_caminhos, ...).
+    Retorna um dicionário {coluna: DataFrame de quantis}.
+    """
+    if colunas is None:
+        colunas = df.select_dtypes(include=np.number).columns
+    return {col: prever_kpi(df[col], **kwargs) for col in colunas}
+
+
+def plotar_leque(previsao, titulo=None, historico=None, xlabel='Período', ylabel=None):
+    """
+    Gráfico em leque de uma previsão de `prever_kpi`: a mediana (ou a média) e
+    as faixas entre quantis simétricos (p5-p95, p25-p75, ...).
+    - historico: Series opcional com os valores observados, desenhada antes da
+      previsão (períodos 0, -1, -2, ...)
+    Retorna fig, ax.
+    """
+    colunas_q = sorted((c for c in previsao.columns if re.fullmatch(r'p[\d.]+', c)),
+                       key=lambda c: float(c[1:]))
+    faixas = [(colunas_q[i], colunas_q[-1 - i]) for i in range(len(colunas_q) // 2)]
+    centro = 'p50' if 'p50' in previsao.columns else 'media'
+    if historico is not None:
+        historico = pd.Series(pd.Series(historico).dropna().to_numpy())
+        historico.index = np.arange(1 - len(historico), 1)
+    return ChartGenerator(previsao).fan_chart('periodo', centro, faixas, history=historico,
+                                              title=titulo, xlabel=xlabel, ylabel=ylabel)
@@ -68,6 +68,32 @@ import pandas as pd
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 
+import sys
+from pathlib import Path
+# enviar_prova fica ao lado da pasta deste script (no notebook, que não tem
+# __file__, ao lado do diretório de trabalho)
+_raiz = Path(__file__).resolve().parent.parent if '__file__' in globals() else Path.cwd().parent
+sys.path.append(str(_raiz / 'enviar_prova'))
+try:
+    from instrumentacao import ativar, etapa, salvar_relatorio
+except ImportError:  # sem instrumentacao.py o script roda normalmente, sem medição
+    from contextlib import nullcontext
+    from types import SimpleNamespace
+
+    def ativar(memoria=False):
+        pass
+
+    def etapa(nome, linhas=None):
+        return nullcontext(SimpleNamespace(linhas=linhas))
+
+    def salvar_relatorio(caminho, flamegraph=None):
+        pass
+
+# mude para True para medir tempo, CPU e memória de cada etapa da geração
+INSTRUMENTAR = False
+if INSTRUMENTAR:
+    ativar(memoria=True)
+
 # %% [markdown]
 # #### 2.3 Definindo o período e gerando datas com sazonalidade
 
@@ -85,27 +111,34 @@ days = pd.date_range(start_date, end_date, freq='D')
 # %% [markdown]
 # Aqui será gerado os numéros de sessões por dia com variação no Natal e na black friday, a fim de gerar os ruídos similares aos encontrados em datasets reais. No natal haverá 30% mais visitas, já na black friday as visitas dobrarão
 # 
+# A geração fica na função `gerar_sessoes`, usada também pelos benchmarks (`benchmarks/benchmark.py`).
 
 # %%
-sessions = []
+def gerar_sessoes(days, base_sessions=300):
+    sessions = []
+    for day in days:
+        n = np.random.poisson(base_sessions)
+        # Natal
+        if day.month == 12 and 20 <= day.day <= 24:
+            n = int(n * 1.3)
+
+        # Black Friday
+        if day.month == 11 and day.weekday() == 4 and day.day >= 23:
+            n = int(n * 2)
+        for _ in range(n):
+            random_time = day + timedelta(
+                hours=np.random.randint(0, 24),
+                minutes=np.random.randint(0, 60),
+                seconds=np.random.randint(0, 60)
+            )
+            sessions.append(random_time)
+    return sessions
+
 base_sessions = 300
 
-for day in days:
-    n = np.random.poisson(base_sessions)
-    # Natal
-    if day.month == 12 and 20 <= day.day <= 24:
-        n = int(n * 1.3)
-
-    # Black Friday
-    if day.month == 11 and day.weekday() == 4 and day.day >= 23:
-        n = int(n * 2)
-    for _ in range(n):
-        random_time = day + timedelta(
-            hours=np.random.randint(0, 24),
-            minutes=np.random.randint(0, 60),
-            seconds=np.random.randint(0, 60)
-        )
-        sessions.append(random_time)
+with etapa('geracao_sessoes') as registro:
+    sessions = gerar_sessoes(days, base_sessions)
+    registro.linhas = len(sessions)
 
 timestamps = sessions
 
@@ -116,11 +149,12 @@ timestamps = sessions
 # Inicia as outras colunas do dataframe, como session_id, user_id, product_id e page_url
 
 # %%
-df = pd.DataFrame({'timestamp': timestamps})
-df['session_id'] = ['sess_' + str(i) for i in range(len(df))]
-df['user_id'] = np.random.randint(1, 10000, size=len(df))
-df['product_id'] = np.random.randint(1, 1000, size=len(df))
-df['page_url'] = df['product_id'].apply(lambda x: f"/produto/{x}")
+with etapa('colunas_ids', linhas=len(timestamps)):
+    df = pd.DataFrame({'timestamp': timestamps})
+    df['session_id'] = ['sess_' + str(i) for i in range(len(df))]
+    df['user_id'] = np.random.randint(1, 10000, size=len(df))
+    df['product_id'] = np.random.randint(1, 1000, size=len(df))
+    df['page_url'] = df['product_id'].apply(lambda x: f"/produto/{x}")
 
 # %% [markdown]
 # #### 2.6 Adicionando variáveis de comportamento
@@ -130,7 +164,8 @@ df['page_url'] = df['product_id'].apply(lambda x: f"/produto/{x}")
 
 # %%
 # add_to_cart com probabilidade 0.2
-df['add_to_cart'] = np.random.rand(len(df)) < 0.2
+with etapa('coluna_add_to_cart', linhas=len(df)):
+    df['add_to_cart'] = np.random.rand(len(df)) < 0.2
 
 # %% [markdown]
 # ##### Ajustando session_duration conforme `add_to_cart`
@@ -139,10 +174,11 @@ df['add_to_cart'] = np.random.rand(len(df)) < 0.2
 # Gera o tempo de sessão e aumenta em 50% o tempo de sessão em que `add_to_cart` é `true`
 
 # %%
-# Duração exponencial
-df['session_duration'] = np.random.exponential(scale=300, size=len(df))
-# Aumenta duração em sessões com add_to_cart
-df.loc[df['add_to_cart'], 'session_duration'] *= 1.5
+with etapa('coluna_session_duration', linhas=len(df)):
+    # Duração exponencial
+    df['session_duration'] = np.random.exponential(scale=300, size=len(df))
+    # Aumenta duração em sessões com add_to_cart
+    df.loc[df['add_to_cart'], 'session_duration'] *= 1.5
 
 # %% [markdown]
 # ##### Definindo `purchase` dependente de `add_to_cart`
@@ -151,8 +187,9 @@ df.loc[df['add_to_cart'], 'session_duration'] *= 1.5
 # Adiciona a coluna `purchase`. Ela tem 20% de chance de ser verdadeira se a coluna `add_to_cart` é verdadeira
 
 # %%
-purchase_prob = np.where(df['add_to_cart'], 0.2, 0.0)
-df['purchase'] = np.random.rand(len(df)) < purchase_prob
+with etapa('coluna_purchase', linhas=len(df)):
+    purchase_prob = np.where(df['add_to_cart'], 0.2, 0.0)
+    df['purchase'] = np.random.rand(len(df)) < purchase_prob
 
 # %% [markdown]
 # ##### Inserindo valores nulos
@@ -161,8 +198,9 @@ df['purchase'] = np.random.rand(len(df)) < purchase_prob
 # Insere valor nulo em `user_id` para representar usuários não logados. A probabilidade do usuário ser nulo é de 10%
 
 # %%
-mask = np.random.rand(len(df)) < 0.1
-df.loc[mask, 'user_id'] = pd.NA
+with etapa('valores_nulos', linhas=len(df)):
+    mask = np.random.rand(len(df)) < 0.1
+    df.loc[mask, 'user_id'] = pd.NA
 df.isnull().sum()
 
 # %% [markdown]
@@ -177,6 +215,13 @@ df.head()
 # %%
 len(df)
 
+# %% [markdown]
+# Relatório de desempenho da geração (apenas com `INSTRUMENTAR = True`): tempo de relógio, tempo de CPU, pico de memória e linhas por etapa. O arquivo `.folded` pode ser aberto no speedscope ou no flamegraph.pl.
+
+# %%
+if INSTRUMENTAR:
+    salvar_relatorio('relatorio_gerador.json', flamegraph='relatorio_gerador.folded')
+
 # %% [markdown]
 # ### Passo 3: Avaliação da Qualidade dos Dados (3 pontos)
 # 
@@ -90,6 +90,35 @@ from scipy.stats import ttest_ind, chi2_contingency
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from pathlib import Path
+# enviar_prova fica ao lado da pasta deste script (no notebook, que não tem
+# __file__, ao lado do diretório de trabalho)
+_raiz = Path(__file__).resolve().parent.parent if '__file__' in globals() else Path.cwd().parent
+sys.path.append(str(_raiz / 'enviar_prova'))
+try:
+    from instrumentacao import ativar, etapa, medir, salvar_relatorio
+except ImportError:  # sem instrumentacao.py o script roda normalmente, sem medição
+    from contextlib import nullcontext
+    from types import SimpleNamespace
+
+    def ativar(memoria=False):
+        pass
+
+    def etapa(nome, linhas=None):
+        return nullcontext(SimpleNamespace(linhas=linhas))
+
+    def medir(nome=None, linhas=None):
+        return lambda funcao: funcao
+
+    def salvar_relatorio(caminho, flamegraph=None):
+        pass
+from avaliacao import teste_ab_ajustado
+
+# mude para True para medir tempo, CPU e memória de cada etapa da simulação
+INSTRUMENTAR = False
+if INSTRUMENTAR:
+    ativar(memoria=True)
+
 
 seed = 42
 random.seed(seed)
@@ -240,6 +269,7 @@ class Noticia:
 categorias = ['política', 'esporte', 'tecnologia', 'entretenimento', 'economia']
 estilos = ['formal', 'informal']
 
+@medir('gerar_leitores')
 def gerar_leitores(n):
     leitores = []
     for _ in range(n):
@@ -334,6 +364,7 @@ def gerar_noticias(n):
         noticias.append(Noticia(i, categoria, manchete, tempo_estimado, 'formal'))
     return noticias
 
+@medir('coletar_dados_teste_ab')
 def coletar_dados_teste_ab(num_leitores, num_noticias):
     leitores = gerar_leitores(num_leitores)
     noticias_a = gerar_noticias(num_noticias)
@@ -344,15 +375,16 @@ def coletar_dados_teste_ab(num_leitores, num_noticias):
     for versao, noticias in [('A', noticias_a), ('B', noticias_b)]:
         cliques, tempos, rejeicoes, total = 0, [], 0, 0
 
-        for leitor in leitores:
-            noticia = random.choice(noticias)
-            if leitor.decide_clique(noticia):
-                cliques += 1
-                tempo_gasto = leitor.gera_tempo_leitura(noticia)
-                tempos.append(tempo_gasto)
-                if leitor.verifica_rejeicao(noticia, tempo_gasto):
-                    rejeicoes += 1
-            total += 1
+        with etapa('loop_decisao', linhas=len(leitores)):
+            for leitor in leitores:
+                noticia = random.choice(noticias)
+                if leitor.decide_clique(noticia):
+                    cliques += 1
+                    tempo_gasto = leitor.gera_tempo_leitura(noticia)
+                    tempos.append(tempo_gasto)
+                    if leitor.verifica_rejeicao(noticia, tempo_gasto):
+                        rejeicoes += 1
+                total += 1
 
         ctr = cliques / total if total else 0
         tempo_medio = np.mean(tempos) if tempos else 0
@@ -478,84 +510,102 @@ plt.show()
 # 
 
 # %%
-def executar_avaliacao_ab(num_leitores=1000, num_noticias=30):
+def simular_dados_ab(num_leitores=1000, num_noticias=30):
+    """
+    Uma linha por leitor e versão, com o resultado (clique, tempo e bounce) e
+    as características do leitor, conhecidas antes do teste.
+    """
     leitores = gerar_leitores(num_leitores)
     noticias_a = gerar_noticias(num_noticias)
     noticias_b = [gerar_noticia_ab(n.id, n.categoria, n.manchete, n.tempo_estimado, 'B') for n in noticias_a]
 
-    dados = {'versao': [], 'clicou': [], 'tempo': [], 'bounce': []}
+    dados = {'versao': [], 'clicou': [], 'tempo': [], 'bounce': [],
+             'interesse': [], 'idade': [], 'tempo_disp': [], 'categoria_preferida': []}
+
+    with etapa('loop_decisao', linhas=2 * len(leitores)):
+        for versao, noticias in [('A', noticias_a), ('B', noticias_b)]:
+            for leitor in leitores:
+                noticia = random.choice(noticias)
+                clicou = leitor.decide_clique(noticia)
+                tempo_gasto = leitor.gera_tempo_leitura(noticia) if clicou else np.nan
+                bounce = leitor.verifica_rejeicao(noticia, tempo_gasto) if clicou else np.nan
+
+                dados['versao'].append(versao)
+                dados['clicou'].append(int(clicou))
+                dados['tempo'].append(tempo_gasto)
+                dados['bounce'].append(int(bounce) if clicou else np.nan)
+                dados['interesse'].append(leitor.interesse)
+                dados['idade'].append(leitor.idade)
+                dados['tempo_disp'].append(leitor.tempo_disp)
+                dados['categoria_preferida'].append(leitor.categoria_preferida)
 
-    for versao, noticias in [('A', noticias_a), ('B', noticias_b)]:
-        for leitor in leitores:
-            noticia = random.choice(noticias)
-            clicou = leitor.decide_clique(noticia)
-            tempo_gasto = leitor.gera_tempo_leitura(noticia) if clicou else np.nan
-            bounce = leitor.verifica_rejeicao(noticia, tempo_gasto) if clicou else np.nan
+    df = pd.DataFrame(dados)
+    df['faixa_etaria'] = pd.cut(df['idade'], bins=[17, 24, 34, 44, 54, 80])
+    return df
 
-            dados['versao'].append(versao)
-            dados['clicou'].append(int(clicou))
-            dados['tempo'].append(tempo_gasto)
-            dados['bounce'].append(int(bounce) if clicou else np.nan)
 
-    df = pd.DataFrame(dados)
+@medir('executar_avaliacao_ab')
+def executar_avaliacao_ab(num_leitores=1000, num_noticias=30):
+    df = simular_dados_ab(num_leitores, num_noticias)
 
     resultados = []
 
-    # Avaliação para CTR
-    cliques_a = df[df['versao'] == 'A']['clicou'].sum()
-    cliques_b = df[df['versao'] == 'B']['clicou'].sum()
-    n_a = len(df[df['versao'] == 'A'])
-    n_b = len(df[df['versao'] == 'B'])
-
-    # Z-test CTR
-    _, p_ctr_z = proportions_ztest([cliques_a, cliques_b], [n_a, n_b])
-    # Chi-square CTR
-    ctr_contingency = np.array([[cliques_a, n_a - cliques_a], [cliques_b, n_b - cliques_b]])
-    _, p_ctr_chi, _, _ = chi2_contingency(ctr_contingency)
-    # T-test CTR (para fins de exercício)
-    _, p_ctr_t = ttest_ind(df[df['versao'] == 'A']['clicou'], df[df['versao'] == 'B']['clicou'])
-
-    resultados.append(['CTR', p_ctr_z, p_ctr_t, p_ctr_chi])
-
-    # Avaliação Tempo Médio de Leitura (apenas leitores que clicaram)
-    tempo_a = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['tempo'].dropna()
-    tempo_b = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['tempo'].dropna()
-
-    # T-test Tempo Médio
-    _, p_tempo_t = ttest_ind(tempo_a, tempo_b)
-    # Z-test Tempo Médio (simplificado)
-    tempo_a_bin = tempo_a > tempo_a.mean()
-    tempo_b_bin = tempo_b > tempo_b.mean()
-    _, p_tempo_z = proportions_ztest([tempo_a_bin.sum(), tempo_b_bin.sum()], [len(tempo_a_bin), len(tempo_b_bin)])
-    # Chi-square Tempo Médio
-    tempo_contingency = np.array([
-        [tempo_a_bin.sum(), len(tempo_a_bin) - tempo_a_bin.sum()],
-        [tempo_b_bin.sum(), len(tempo_b_bin) - tempo_b_bin.sum()]
-    ])
-    _, p_tempo_chi, _, _ = chi2_contingency(tempo_contingency)
-
-    resultados.append(['Tempo Médio Leitura', p_tempo_z, p_tempo_t, p_tempo_chi])
-
-    # Avaliação Bounce Rate
-    bounce_a = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['bounce'].sum()
-    bounce_b = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['bounce'].sum()
-    total_bounce_a = len(df[(df['versao'] == 'A') & (df['clicou'] == 1)])
-    total_bounce_b = len(df[(df['versao'] == 'B') & (df['clicou'] == 1)])
-
-    # Z-test Bounce
-    _, p_bounce_z = proportions_ztest([bounce_a, bounce_b], [total_bounce_a, total_bounce_b])
-    # Chi-square Bounce
-    bounce_contingency = np.array([
-        [bounce_a, total_bounce_a - bounce_a],
-        [bounce_b, total_bounce_b - bounce_b]
-    ])
-    _, p_bounce_chi, _, _ = chi2_contingency(bounce_contingency)
-    # T-test Bounce
-    bounce_a_vals = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['bounce']
-    bounce_b_vals = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['bounce']
-    _, p_bounce_t = ttest_ind(bounce_a_vals, bounce_b_vals)
-
-    resultados.append(['Bounce Rate', p_bounce_z, p_bounce_t, p_bounce_chi])
+    with etapa('testes_estatisticos', linhas=len(df)):
+        # Avaliação para CTR
+        cliques_a = df[df['versao'] == 'A']['clicou'].sum()
+        cliques_b = df[df['versao'] == 'B']['clicou'].sum()
+        n_a = len(df[df['versao'] == 'A'])
+        n_b = len(df[df['versao'] == 'B'])
+
+        # Z-test CTR
+        _, p_ctr_z = proportions_ztest([cliques_a, cliques_b], [n_a, n_b])
+        # Chi-square CTR
+        ctr_contingency = np.array([[cliques_a, n_a - cliques_a], [cliques_b, n_b - cliques_b]])
+        _, p_ctr_chi, _, _ = chi2_contingency(ctr_contingency)
+        # T-test CTR (para fins de exercício)
+        _, p_ctr_t = ttest_ind(df[df['versao'] == 'A']['clicou'], df[df['versao'] == 'B']['clicou'])
+
+        resultados.append(['CTR', p_ctr_z, p_ctr_t, p_ctr_chi])
+
+        # Avaliação Tempo Médio de Leitura (apenas leitores que clicaram)
+        tempo_a = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['tempo'].dropna()
+        tempo_b = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['tempo'].dropna()
+
+        # T-test Tempo Médio
+        _, p_tempo_t = ttest_ind(tempo_a, tempo_b)
+        # Z-test Tempo Médio (simplificado)
+        tempo_a_bin = tempo_a > tempo_a.mean()
+        tempo_b_bin = tempo_b > tempo_b.mean()
+        _, p_tempo_z = proportions_ztest([tempo_a_bin.sum(), tempo_b_bin.sum()], [len(tempo_a_bin), len(tempo_b_bin)])
+        # Chi-square Tempo Médio
+        tempo_contingency = np.array([
+            [tempo_a_bin.sum(), len(tempo_a_bin) - tempo_a_bin.sum()],
+            [tempo_b_bin.sum(), len(tempo_b_bin) - tempo_b_bin.sum()]
+        ])
+        _, p_tempo_chi, _, _ = chi2_contingency(tempo_contingency)
+
+        resultados.append(['Tempo Médio Leitura', p_tempo_z, p_tempo_t, p_tempo_chi])
+
+        # Avaliação Bounce Rate
+        bounce_a = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['bounce'].sum()
+        bounce_b = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['bounce'].sum()
+        total_bounce_a = len(df[(df['versao'] == 'A') & (df['clicou'] == 1)])
+        total_bounce_b = len(df[(df['versao'] == 'B') & (df['clicou'] == 1)])
+
+        # Z-test Bounce
+        _, p_bounce_z = proportions_ztest([bounce_a, bounce_b], [total_bounce_a, total_bounce_b])
+        # Chi-square Bounce
+        bounce_contingency = np.array([
+            [bounce_a, total_bounce_a - bounce_a],
+            [bounce_b, total_bounce_b - bounce_b]
+        ])
+        _, p_bounce_chi, _, _ = chi2_contingency(bounce_contingency)
+        # T-test Bounce
+        bounce_a_vals = df[(df['versao'] == 'A') & (df['clicou'] == 1)]['bounce']
+        bounce_b_vals = df[(df['versao'] == 'B') & (df['clicou'] == 1)]['bounce']
+        _, p_bounce_t = ttest_ind(bounce_a_vals, bounce_b_vals)
+
+        resultados.append(['Bounce Rate', p_bounce_z, p_bounce_t, p_bounce_chi])
 
     resultado_df = pd.DataFrame(resultados, columns=['Métrica', 'Z-test p-valor', 'T-test p-valor', 'Chi2 p-valor'])
 
@@ -565,6 +615,38 @@ def executar_avaliacao_ab(num_leitores=1000, num_noticias=30):
 resultado_final = executar_avaliacao_ab()
 print(resultado_final)
 
+if INSTRUMENTAR:
+    salvar_relatorio('relatorio_simulador.json', flamegraph='relatorio_simulador.folded')
+
+
+# %% [markdown]
+# ### 5.b) Redução de variância com as características dos leitores
+# 
+# Os testes acima comparam apenas as médias brutas das versões A e B, mas o simulador já conhece, antes do teste, características dos leitores que explicam boa parte do resultado: `interesse`, `idade`, `tempo_disp` e `categoria_preferida`. Como elas não dependem da versão exibida, podem ser usadas para descontar do resultado a variação que vem de "quem é o leitor", deixando a diferença entre as versões mais nítida:
+# 
+# - **CUPED**: subtrai de cada métrica a parte prevista linearmente pelas covariáveis numéricas (`y - theta * (x - média de x)`).
+# - **Regressão**: regressão da métrica nas covariáveis numéricas e na categoria preferida, com coeficientes separados para A e B (ajuste de Lin).
+# - **Pós-estratificação**: compara A e B dentro de cada combinação de faixa etária e categoria preferida e faz a média ponderada pelo tamanho de cada estrato.
+# 
+# A função `teste_ab_ajustado` (de `enviar_prova/avaliacao.py`) calcula todos os estimadores a partir das mesmas somas agregadas por célula (versão x faixa etária x categoria), em uma única passagem pelos dados, com estatística t, p-valor e intervalo de confiança de 95%. A coluna `reducao_variancia` indica quanto da variância do estimador sem ajuste foi eliminada: com uma redução de 40%, a mesma precisão é alcançada com 60% dos leitores.
+
+# %%
+dados_ab = simular_dados_ab(5000, 30)
+resultado_ajustado = teste_ab_ajustado(
+    dados_ab, 'versao', 'A', 'B',
+    metricas=['clicou', 'tempo', 'bounce'],
+    covariaveis=['interesse', 'idade', 'tempo_disp'],
+    categoricas=['categoria_preferida'],
+    estratos=['faixa_etaria', 'categoria_preferida'],
+)
+resultado_ajustado['leitores_necessarios'] = (1 - resultado_ajustado['reducao_variancia']).map('{:.0%}'.format)
+print(resultado_ajustado[['metrica', 'metodo', 'diferenca', 'ic_inf', 'ic_sup', 'p_value',
+                          'reducao_variancia', 'leitores_necessarios']].round(4).to_string(index=False))
+
+
+# %% [markdown]
+# Os ganhos dependem de quanto as covariáveis explicam cada métrica: o tempo de leitura e o bounce dependem diretamente de `interesse` e `tempo_disp`, enquanto o clique é um sorteio com probabilidade baixa, em que a maior parte da variância não é explicada por nenhuma característica do leitor. Com muitos estratos pequenos, a pós-estratificação por faixa etária e categoria pode até perder precisão, já que essas duas variáveis pouco influenciam o resultado.
+
 
 # %% [markdown]
 # ## 6. Relatório de Resultados
@@ -594,3 +676,265 @@ print(resultado_final)
 # 
 
 
+# %% [markdown]
+# ## 7. Análise de Sensibilidade Global
+# 
+# O resultado do teste depende de uma dúzia de constantes do modelo (fatores de afinidade, distribuições dos leitores, redução do tempo da versão B, limiar de rejeição...). Para descobrir quais delas realmente importam, variamos todas ao mesmo tempo dentro de faixas plausíveis e medimos quanto da variância do resultado cada uma explica:
+# 
+# - **Sobol (desenho de Saltelli)**: índice de primeira ordem `S1` (efeito isolado do parâmetro) e índice total `ST` (efeito incluindo interações), com intervalos de confiança por bootstrap.
+# - **Morris (efeitos elementares)**: triagem mais barata; `mu_star` alto indica parâmetro influente e `sigma` alto indica efeito não linear ou com interações.
+# 
+# Como milhares de pontos do desenho precisam ser avaliados, usamos uma versão vetorizada da simulação (mesma lógica de `Leitor`, `gerar_leitores` e `gerar_noticia_ab`), que avalia um lote de pontos de uma vez. Os números aleatórios são fixos entre os pontos (números aleatórios comuns), então a diferença entre dois pontos vem apenas dos parâmetros. Dentro de um ponto, as versões A e B sorteiam a notícia, o clique e a leitura separadamente, como em `coletar_dados_teste_ab`: a diferença B - A carrega o ruído de amostragem de um teste real, e, como esses sorteios também são os mesmos para todos os pontos, os índices de sensibilidade continuam medindo apenas o efeito dos parâmetros (sobre uma realização fixa desse ruído).
+
+# %% [markdown]
+# ### 7.a) Parâmetros e simulação vetorizada
+# 
+# Cada parâmetro tem o valor usado nas seções anteriores e uma faixa de variação. As probabilidades de preferir o estilo formal (0,25 abaixo de 40 anos e 1/3 a partir dos 40) são as que resultam dos pesos usados em `gerar_leitores`.
+
+# %%
+from scipy import special
+from scipy.stats import qmc
+
+# nome: (valor atual, mínimo, máximo)
+PARAMETROS_SENSIBILIDADE = {
+    # Leitor.decide_clique
+    'afinidade_categoria': (0.5, 0.3, 0.8),
+    'afinidade_estilo': (0.7, 0.5, 0.95),
+    'fator_tempo_insuficiente': (0.5, 0.3, 0.8),
+    # Leitor.gera_tempo_leitura e verifica_rejeicao
+    'fator_interesse_categoria': (0.8, 0.6, 1.0),
+    'desvio_tempo_leitura': (0.5, 0.2, 1.0),
+    'limiar_rejeicao': (0.3, 0.2, 0.4),
+    # gerar_noticia_ab
+    'reducao_tempo_b': (0.7, 0.5, 0.9),
+    # gerar_leitores
+    'idade_media': (35, 28, 45),
+    'idade_desvio': (10, 6, 14),
+    'tempo_forma': (2, 1.5, 3),
+    'tempo_escala': (5, 3, 7),
+    'interesse_a': (2, 1.5, 3),
+    'interesse_b': (5, 3.5, 7),
+    'idade_corte_estilo': (40, 30, 50),
+    'prob_formal_jovem': (0.25, 0.1, 0.5),
+    'prob_formal_maduro': (1 / 3, 0.2, 0.8),
+}
+
+pesos_categorias = [0.2, 0.25, 0.2, 0.2, 0.15]
+
+
+def _simular_lote(p, base):
+    """Simula as versões A e B para um lote de pontos (linhas) e todos os leitores (colunas)."""
+    idade = np.clip(np.trunc(p['idade_media'] + p['idade_desvio'] * base['z_idade']), 18, 80)
+    tempo_disp = np.clip(special.gammaincinv(p['tempo_forma'], base['u_tempo']) * p['tempo_escala'], 1, 30)
+    interesse = np.clip(special.betaincinv(p['interesse_a'], p['interesse_b'], base['u_interesse']), 0.1, 1.0)
+    prob_formal = np.where(idade >= p['idade_corte_estilo'], p['prob_formal_maduro'], p['prob_formal_jovem'])
+    prefere_formal = base['u_estilo'] < prob_formal
+
+    metricas = {}
+    for versao in ('A', 'B'):
+        # como em coletar_dados_teste_ab, cada versão sorteia de novo a notícia, o clique e a leitura
+        sorteios = base[versao]
+        mesma_categoria = sorteios['mesma_categoria']
+        afinidade_categoria = np.where(mesma_categoria, 1.0, p['afinidade_categoria'])
+        interesse_real = interesse * np.where(mesma_categoria, 1.0, p['fator_interesse_categoria'])
+        if versao == 'A':
+            tempo_estimado, mesmo_estilo = sorteios['tempo_noticia'], prefere_formal
+        else:
+            tempo_estimado, mesmo_estilo = np.maximum(1, sorteios['tempo_noticia'] * p['reducao_tempo_b']), ~prefere_formal
+        probabilidade = (interesse * afinidade_categoria
+                         * np.where(mesmo_estilo, 1.0, p['afinidade_estilo'])
+                         * np.where(tempo_disp >= tempo_estimado, 1.0, p['fator_tempo_insuficiente']))
+        clique = sorteios['u_clique'] < probabilidade
+        tempo_gasto = np.maximum(np.minimum(tempo_disp, tempo_estimado) * interesse_real
+                                 + p['desvio_tempo_leitura'] * sorteios['z_leitura'], 0.1)
+        rejeicao = clique & (tempo_gasto < p['limiar_rejeicao'] * tempo_estimado)
+
+        cliques = clique.sum(axis=1)
+        metricas[f'ctr_{versao}'] = cliques / clique.shape[1]
+        metricas[f'tempo_{versao}'] = np.where(clique, tempo_gasto, 0).sum(axis=1) / np.maximum(cliques, 1)
+        metricas[f'bounce_{versao}'] = rejeicao.sum(axis=1) / np.maximum(cliques, 1)
+    return metricas
+
+
+@medir('simular_ab_vetorizado')
+def simular_ab_vetorizado(parametros=None, n_leitores=5000, num_noticias=30, seed=42, tamanho_lote=None):
+    """
+    Versão vetorizada de `coletar_dados_teste_ab` para muitos conjuntos de parâmetros.
+    - parametros: DataFrame com uma linha por ponto do desenho e colunas com nomes
+      de PARAMETROS_SENSIBILIDADE (as ausentes usam o valor atual); None simula só o cenário atual
+    - seed: fixa leitores, notícias e sorteios, que são os mesmos para todos os pontos
+      (as versões A e B sorteiam notícia, clique e leitura separadamente)
+    - tamanho_lote: pontos avaliados por vez (padrão: ~2 milhões de leitores-ponto por lote)
+    Retorna um DataFrame com CTR, tempo médio e bounce rate de A e B e as diferenças B - A.
+    """
+    if parametros is None:
+        parametros = pd.DataFrame([{nome: valor for nome, (valor, _, _) in PARAMETROS_SENSIBILIDADE.items()}])
+    rng = np.random.default_rng(seed)
+    categoria_leitor = np.searchsorted(np.cumsum(pesos_categorias), rng.random(n_leitores) * sum(pesos_categorias))
+    categoria_noticia = rng.integers(0, len(categorias), num_noticias)
+    tempo_noticia = rng.uniform(2, 8, num_noticias)
+    base = {
+        'z_idade': rng.standard_normal(n_leitores),
+        'u_tempo': rng.random(n_leitores),
+        'u_interesse': rng.random(n_leitores),
+        'u_estilo': rng.random(n_leitores),
+    }
+    for versao in ('A', 'B'):
+        noticia = rng.integers(0, num_noticias, n_leitores)
+        base[versao] = {
+            'u_clique': rng.random(n_leitores),
+            'z_leitura': rng.standard_normal(n_leitores),
+            'mesma_categoria': categoria_leitor == categoria_noticia[noticia],
+            'tempo_noticia': tempo_noticia[noticia],
+        }
+
+    tamanho_lote = tamanho_lote or max(1, 2_000_000 // n_leitores)
+    partes = []
+    for inicio in range(0, len(parametros), tamanho_lote):
+        lote = parametros.iloc[inicio:inicio + tamanho_lote]
+        p = {nome: (lote[nome].to_numpy(dtype=float) if nome in lote else np.full(len(lote), float(valor)))[:, None]
+             for nome, (valor, _, _) in PARAMETROS_SENSIBILIDADE.items()}
+        partes.append(pd.DataFrame(_simular_lote(p, base)))
+    resultado = pd.concat(partes, ignore_index=True)
+    resultado['lift_ctr'] = resultado['ctr_B'] - resultado['ctr_A']
+    resultado['dif_tempo'] = resultado['tempo_B'] - resultado['tempo_A']
+    resultado['dif_bounce'] = resultado['bounce_B'] - resultado['bounce_A']
+    return resultado
+
+
+# %% [markdown]
+# ### 7.b) Índices de Sobol
+# 
+# O desenho de Saltelli usa duas matrizes de pontos quase aleatórios (sequência de Sobol), `A` e `B`, e mais uma matriz `AB_i` por parâmetro (`A` com a coluna `i` trocada pela de `B`), totalizando `n_base * (d + 2)` avaliações. Os índices usam os estimadores de Saltelli (primeira ordem) e de Jansen (total), e os intervalos de confiança vêm da reamostragem das linhas do desenho.
+
+# %%
+def _escalar(unitario):
+    minimos = np.array([minimo for _, minimo, _ in PARAMETROS_SENSIBILIDADE.values()])
+    maximos = np.array([maximo for _, _, maximo in PARAMETROS_SENSIBILIDADE.values()])
+    return pd.DataFrame(minimos + unitario * (maximos - minimos), columns=list(PARAMETROS_SENSIBILIDADE))
+
+
+def desenho_saltelli(n_base=512, seed=0):
+    """
+    Pontos do desenho de Saltelli: A, B e os AB_i empilhados, nessa ordem.
+    - n_base: linhas de A e B (de preferência potência de 2)
+    Retorna um DataFrame com n_base * (d + 2) linhas.
+    """
+    d = len(PARAMETROS_SENSIBILIDADE)
+    amostra = qmc.Sobol(2 * d, scramble=True, seed=seed).random(n_base)
+    A, B = amostra[:, :d], amostra[:, d:]
+    AB = np.repeat(A[None], d, axis=0)
+    AB[np.arange(d), :, np.arange(d)] = B.T
+    return _escalar(np.vstack([A, B, AB.reshape(-1, d)]))
+
+
+def indices_sobol(saida, n_base, n_bootstrap=500, confianca=0.95, seed=0):
+    """
+    Índices de Sobol de primeira ordem (S1) e totais (ST) a partir das saídas
+    do desenho de Saltelli, na ordem de `desenho_saltelli`.
+    Retorna um DataFrame com os índices e os intervalos de confiança por bootstrap.
+    """
+    d = len(PARAMETROS_SENSIBILIDADE)
+    y = np.asarray(saida, dtype=float)
+    fA, fB, fAB = y[:n_base], y[n_base:2 * n_base], y[2 * n_base:].reshape(d, n_base)
+
+    def estimar(linhas):
+        a, b, ab = fA[linhas], fB[linhas], fAB[:, linhas]
+        variancia = np.concatenate([a, b], axis=-1).var(axis=-1)
+        s1 = (b * (ab - a)).mean(axis=-1) / variancia
+        st = 0.5 * ((a - ab) ** 2).mean(axis=-1) / variancia
+        return s1, st
+
+    s1, st = estimar(np.arange(n_base))
+    reamostras = np.random.default_rng(seed).integers(0, n_base, size=(n_bootstrap, n_base))
+    s1_boot, st_boot = estimar(reamostras)  # (d, n_bootstrap)
+    caudas = [(1 - confianca) / 2, (1 + confianca) / 2]
+    s1_ic, st_ic = np.quantile(s1_boot, caudas, axis=1), np.quantile(st_boot, caudas, axis=1)
+    return pd.DataFrame({
+        'S1': s1, 'S1_ic_inf': s1_ic[0], 'S1_ic_sup': s1_ic[1],
+        'ST': st, 'ST_ic_inf': st_ic[0], 'ST_ic_sup': st_ic[1],
+    }, index=pd.Index(list(PARAMETROS_SENSIBILIDADE), name='parametro')).sort_values('ST', ascending=False)
+
+
+# %% [markdown]
+# ### 7.c) Efeitos elementares de Morris
+# 
+# Cada trajetória parte de um ponto em uma grade de `niveis` valores e muda um parâmetro por vez, em ordem aleatória, com passo `delta = niveis / (2 * (niveis - 1))`. O efeito elementar de cada parâmetro é a variação da saída dividida pelo passo (na escala 0-1 da faixa do parâmetro).
+
+# %%
+def desenho_morris(n_trajetorias=50, niveis=4, seed=0):
+    """
+    Trajetórias de Morris com d + 1 pontos cada.
+    Retorna (pontos, unitario): o DataFrame de parâmetros, com n_trajetorias * (d + 1)
+    linhas, e os mesmos pontos na escala 0-1, usados por `efeitos_morris`.
+    """
+    d = len(PARAMETROS_SENSIBILIDADE)
+    rng = np.random.default_rng(seed)
+    delta = niveis / (2 * (niveis - 1))
+    grade = np.arange(niveis // 2) / (niveis - 1)  # pontos de partida que permitem +delta
+    unitario = np.empty((n_trajetorias, d + 1, d))
+    unitario[:, 0] = rng.choice(grade, size=(n_trajetorias, d))
+    sinais = rng.choice([-1.0, 1.0], size=(n_trajetorias, d))
+    # começando pelo outro lado quando o passo é para baixo, todos os pontos ficam em [0, 1]
+    unitario[:, 0] = np.where(sinais < 0, unitario[:, 0] + delta, unitario[:, 0])
+    ordem = np.argsort(rng.random((n_trajetorias, d)), axis=1)
+    for passo in range(d):
+        unitario[:, passo + 1] = unitario[:, passo]
+        linhas = np.arange(n_trajetorias)
+        coluna = ordem[:, passo]
+        unitario[linhas, passo + 1, coluna] += sinais[linhas, coluna] * delta
+    return _escalar(unitario.reshape(-1, d)), unitario
+
+
+def efeitos_morris(saida, unitario):
+    """
+    Estatísticas dos efeitos elementares por parâmetro: mu (média), mu_star
+    (média dos valores absolutos) e sigma (desvio-padrão).
+    """
+    n_trajetorias, pontos, d = unitario.shape
+    y = np.asarray(saida, dtype=float).reshape(n_trajetorias, pontos)
+    passos = np.diff(unitario, axis=1)  # (trajetórias, d, d): um único parâmetro muda por passo
+    parametro = np.abs(passos).argmax(axis=2)
+    efeitos = np.diff(y, axis=1) / np.take_along_axis(passos, parametro[:, :, None], axis=2)[:, :, 0]
+    por_parametro = np.empty((n_trajetorias, d))
+    por_parametro[np.arange(n_trajetorias)[:, None], parametro] = efeitos
+    return pd.DataFrame({
+        'mu': por_parametro.mean(axis=0),
+        'mu_star': np.abs(por_parametro).mean(axis=0),
+        'sigma': por_parametro.std(axis=0, ddof=1),
+    }, index=pd.Index(list(PARAMETROS_SENSIBILIDADE), name='parametro')).sort_values('mu_star', ascending=False)
+
+
+# %% [markdown]
+# ### 7.d) Execução
+# 
+# Primeiro conferimos que a versão vetorizada reproduz a simulação original no cenário atual. Em seguida, a triagem de Morris e os índices de Sobol para o **lift de CTR** (CTR de B menos CTR de A); as mesmas avaliações do desenho de Saltelli também dão os índices das diferenças de tempo médio e de bounce rate. Com `n_base=512` e 5000 leitores por ponto, são 9216 avaliações em poucos minutos de CPU.
+
+# %%
+cenario_atual = simular_ab_vetorizado(n_leitores=200_000)
+print(cenario_atual[['ctr_A', 'ctr_B', 'tempo_A', 'tempo_B', 'bounce_A', 'bounce_B']].round(4))
+print(coletar_dados_teste_ab(20_000, 30).round(4))
+
+pontos_morris, unitario_morris = desenho_morris(n_trajetorias=50)
+morris = efeitos_morris(simular_ab_vetorizado(pontos_morris)['lift_ctr'], unitario_morris)
+print(morris.round(4))
+
+n_base = 512
+resultados_saltelli = simular_ab_vetorizado(desenho_saltelli(n_base))
+# as mesmas avaliações servem para as três diferenças entre as versões
+indices = {saida: indices_sobol(resultados_saltelli[saida], n_base)
+           for saida in ['lift_ctr', 'dif_tempo', 'dif_bounce']}
+print(pd.concat({saida: tabela[['S1', 'ST']] for saida, tabela in indices.items()}, axis=1).round(3))
+
+sobol = indices['lift_ctr']
+
+fig, ax = plt.subplots(figsize=(10, 5))
+posicoes = np.arange(len(sobol))
+for deslocamento, indice, cor in [(-0.2, 'S1', 'skyblue'), (0.2, 'ST', 'steelblue')]:
+    erro = [sobol[indice] - sobol[f'{indice}_ic_inf'], sobol[f'{indice}_ic_sup'] - sobol[indice]]
+    ax.bar(posicoes + deslocamento, sobol[indice], width=0.4, yerr=erro, color=cor, label=indice, capsize=2)
+ax.set_xticks(posicoes, sobol.index, rotation=45, ha='right')
+ax.set_title('Índices de Sobol do lift de CTR (B - A)')
+ax.legend()
+plt.tight_layout()
+plt.show()